@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+api_standin.py
+
+Local stand-in for the remote services of J-Bot (OpenWeather, AirVisual, Azure and Google
+text-to-speech), so the pipeline can be load-tested without using the quotas of the APIs and
+without depending on the network
+
+    # 1. Record: the requests are forwarded to the real APIs and their responses are stored
+    python3 benchmarks/api_standin.py --mode record --azure-endpoint https://<your endpoint>
+    # 2. Replay: the stored responses are answered, after an injected latency
+    python3 benchmarks/api_standin.py --mode replay --latency openweather=0.3 azure=0.5 --jitter 0.2
+
+J-Bot is pointed to the stand-in in config.py (OPENWEATHER_URL, AIRVISUAL_URL,
+AZURE_ANALYZE_URL and GOOGLE_TTS_URL), e.g. OPENWEATHER_URL = 'http://localhost:8090/openweather'.
+A request that was not recorded is answered with a recording of the same path (or of the same
+service), e.g. the Azure analysis of another frame.
+
+'''
+
+## Necessary Packages
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+from aiohttp import (web, ClientSession)
+# bench_utils makes the modules of codes/ importable
+import bench_utils
+import config
+
+# Real APIs, the Azure endpoint is given with --azure-endpoint
+UPSTREAMS = {'openweather': 'https://api.openweathermap.org',
+             'airvisual': 'http://api.airvisual.com'}
+
+# Query parameters holding the API keys: they are neither stored nor used to match the requests
+SECRET_PARAMS = {'appid', 'key'}
+
+# Request headers forwarded to the real APIs
+FORWARDED_HEADERS = ('Content-Type', 'Ocp-Apim-Subscription-Key', 'Authorization')
+
+def request_key(method, path, query, body):
+
+    '''
+
+    Args:
+        - method: (str) HTTP method
+        - path: (str) path of the request in the service
+        - query: (dict) query parameters
+        - body: (bytes) body of the request
+    Returns:
+        - (str) key of the recording of the request
+
+    '''
+
+    query = sorted((k, v) for k, v in query.items() if k not in SECRET_PARAMS)
+    digest = hashlib.sha256(json.dumps([method, path, query]).encode() + body)
+    return digest.hexdigest()[:24]
+
+
+class RecordingStore:
+
+    '''
+
+    Recorded responses, one json file per request: <directory>/<service>/<key>.json
+
+    Args:
+        - directory: (str) directory of the recordings
+
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        # service -> key -> recording
+        self.recordings = {}
+        if os.path.isdir(directory):
+            for service in os.listdir(directory):
+                service_dir = os.path.join(directory, service)
+                for name in sorted(os.listdir(service_dir)):
+                    if not name.endswith('.json'):
+                        continue
+                    with open(os.path.join(service_dir, name)) as f:
+                        self.recordings.setdefault(service, {})[name[:-len('.json')]] = json.load(f)
+
+    def save(self, service, key, recording):
+
+        '''
+
+        Args:
+            - service: (str) e.g. 'openweather'
+            - key: (str) see request_key
+            - recording: (dict) path, status, content_type and base64 body of the response
+
+        '''
+
+        service_dir = os.path.join(self.directory, service)
+        os.makedirs(service_dir, exist_ok=True)
+        tmp_path = os.path.join(service_dir, key + '.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(recording, f)
+        os.replace(tmp_path, os.path.join(service_dir, key + '.json'))
+        self.recordings.setdefault(service, {})[key] = recording
+
+    def find(self, service, key, path):
+
+        '''
+
+        Args:
+            - service: (str) e.g. 'openweather'
+            - key: (str) see request_key
+            - path: (str) path of the request in the service
+        Returns:
+            - (dict) the recording of the request, else of the same path, else of the same
+              service. None if the service was never recorded
+
+        '''
+
+        recordings = self.recordings.get(service, {})
+        if key in recordings:
+            return recordings[key]
+        same_path = [r for r in recordings.values() if r['path'] == path]
+        candidates = same_path or list(recordings.values())
+        return random.choice(candidates) if candidates else None
+
+
+def synthesize_upstream(body):
+    # Google text-to-speech is recorded through the Google Cloud client of jetbot_actions
+    from jetbot_actions import synthesize
+    request = json.loads(body)
+    audio = synthesize(request['voice']['name'], request['input']['text'])
+    return json.dumps({'audioContent': base64.b64encode(audio).decode()}).encode(), 'application/json'
+
+async def fetch_upstream(app, service, request, path, body):
+
+    '''
+
+    Args:
+        - app: (aiohttp.web.Application) the stand-in
+        - service: (str) e.g. 'openweather'
+        - request: (aiohttp.web.Request) the request of J-Bot
+        - path: (str) path of the request in the service
+        - body: (bytes) body of the request
+    Returns:
+        - (dict) the recording of the response of the real API
+
+    '''
+
+    if service == 'google-tts':
+        loop = asyncio.get_running_loop()
+        content, content_type = await loop.run_in_executor(None, synthesize_upstream, body)
+        status = 200
+    else:
+        upstream = app['upstreams'][service]
+        headers = {h: request.headers[h] for h in FORWARDED_HEADERS if h in request.headers}
+        async with app['client'].request(request.method, upstream + path, params=request.query,
+                                         data=body, headers=headers) as response:
+            content = await response.read()
+            content_type = response.content_type
+            status = response.status
+
+    return {'path': path, 'status': status, 'content_type': content_type,
+            'body': base64.b64encode(content).decode()}
+
+def injected_latency(app, service):
+    latency = app['latency'].get(service, 0.0)
+    jitter = app['jitter']
+    return max(0.0, latency * random.uniform(1 - jitter, 1 + jitter))
+
+async def handle(request):
+    app = request.app
+    service = request.match_info['service']
+    path = '/' + request.match_info['path']
+    body = await request.read()
+    key = request_key(request.method, path, dict(request.query), body)
+
+    if app['mode'] == 'record':
+        if service not in app['upstreams'] and service != 'google-tts':
+            raise web.HTTPNotFound(text=f'No upstream for {service!r}')
+        recording = await fetch_upstream(app, service, request, path, body)
+        # Only the successful responses are replayed
+        if recording['status'] < 400:
+            app['store'].save(service, key, recording)
+    else:
+        recording = app['store'].find(service, key, path)
+        if recording is None:
+            raise web.HTTPNotFound(text=f'Nothing recorded for {service!r}')
+        await asyncio.sleep(injected_latency(app, service))
+
+    return web.Response(status=recording['status'], body=base64.b64decode(recording['body']),
+                        content_type=recording['content_type'])
+
+async def open_client(app):
+    app['client'] = ClientSession()
+    yield
+    await app['client'].close()
+
+def create_app(mode, store, upstreams, latency, jitter):
+
+    '''
+
+    Args:
+        - mode: (str) 'record' or 'replay'
+        - store: (RecordingStore) the recordings
+        - upstreams: (dict) service -> base url of the real API
+        - latency: (dict) service -> mean injected latency in seconds (replay)
+        - jitter: (float) the latency varies by +/- jitter * latency
+    Returns:
+        - (aiohttp.web.Application) the stand-in
+
+    '''
+
+    app = web.Application(client_max_size=config.SERVICE_MAX_UPLOAD)
+    app['mode'] = mode
+    app['store'] = store
+    app['upstreams'] = upstreams
+    app['latency'] = latency
+    app['jitter'] = jitter
+    app.cleanup_ctx.append(open_client)
+    app.router.add_route('*', '/{service}/{path:.*}', handle)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Record / replay stand-in for the remote services of J-Bot')
+    parser.add_argument('--mode', choices=['record', 'replay'], default='replay')
+    parser.add_argument('--recordings', default='recordings/apis')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--azure-endpoint', default=None, help='your Azure endpoint, to record Azure')
+    parser.add_argument('--latency', nargs='*', default=[], metavar='SERVICE=SECONDS',
+                        help='injected latency per service, e.g. openweather=0.3 google-tts=0.8')
+    parser.add_argument('--jitter', type=float, default=0.0, help='the latency varies by +/- jitter * latency')
+    args = parser.parse_args()
+
+    latency = {}
+    for item in args.latency:
+        service, seconds = item.split('=')
+        latency[service] = float(seconds)
+
+    upstreams = dict(UPSTREAMS)
+    if args.azure_endpoint:
+        upstreams['azure'] = args.azure_endpoint.rstrip('/')
+
+    # Record Google text-to-speech with the Google Cloud client, not through the stand-in itself
+    config.GOOGLE_TTS_URL = None
+
+    store = RecordingStore(args.recordings)
+    print(f'{args.mode}: {sum(len(r) for r in store.recordings.values())} recordings in {args.recordings}')
+    web.run_app(create_app(args.mode, store, upstreams, latency, args.jitter), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
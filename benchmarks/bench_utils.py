@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+bench_utils.py
+
+Helpers shared by the benchmarks
+
+(1) percentile:
+    - Nearest-rank percentile of measured values
+(2) read_frames:
+    - Read recorded frames as J-Bot camera frames (BGR numpy arrays)
+
+'''
+
+## Necessary Packages
+import math
+import os
+import sys
+
+# The modules in codes/ import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'codes'))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def percentile(values, q):
+
+    '''
+
+    Args:
+        - values: (list) measured values
+        - q: (float) percentile between 0 and 100
+    Returns:
+        - (float) the nearest-rank percentile of the values
+
+    '''
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def list_frames(directory):
+
+    '''
+
+    Args:
+        - directory: (str) directory of recorded frames
+    Returns:
+        - (list) paths of the images in the directory, sorted by name
+
+    '''
+
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if f.lower().endswith(IMAGE_EXTENSIONS))
+
+def read_frames(paths):
+
+    '''
+
+    Args:
+        - paths: (list) paths of recorded frames
+    Returns:
+        - (list) HxWx3 BGR numpy arrays, like the frames of the J-Bot camera
+
+    '''
+
+    from preprocessing import Frame
+    return [Frame.from_path(path).array[..., ::-1].copy() for path in paths]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+cascade.py
+
+Skip rate, latency and accuracy of the cascade outfit classification (the small model
+answering first, see inference.CascadeSession) for different margins, next to the small and
+the big model alone, on the test images of the dataset
+
+    python3 benchmarks/cascade.py --small models/clothe_model_small.pkl --margins 0.1 0.3 0.5
+
+Every image is scored against the classes of its own body part (TOP_CLASSES or BOT_CLASSES),
+as clothes_recognition.scoreCrops does on J-Bot.
+
+'''
+
+## Necessary Packages
+import argparse
+import time
+from bench_utils import percentile
+import config
+from clothes_recognition import (CLASSES, TOP_CLASSES, BOT_CLASSES, scoreCrops)
+from evaluation import load_dataset
+from inference import (InferenceSession, CascadeSession)
+
+def run(model, dataloader):
+
+    '''
+
+    Args:
+        - model: InferenceSession or CascadeSession
+        - dataloader: (torch.utils.data.DataLoader) test images, labelled in the order of CLASSES
+    Returns:
+        - accuracy: (float) share of the images classified correctly within their body part
+        - latencies: (list) seconds per image of every batch
+
+    '''
+
+    corrects, total, latencies = 0, 0, []
+    for inputs, labels in dataloader:
+        names = [CLASSES[label] for label in labels.tolist()]
+        subsets = [TOP_CLASSES if name in TOP_CLASSES else BOT_CLASSES for name in names]
+
+        since = time.perf_counter()
+        scores = scoreCrops(inputs, model, subsets)
+        latencies.append((time.perf_counter() - since) / len(names))
+
+        corrects += sum(subset[probs.argmax().item()] == name
+                        for probs, subset, name in zip(scores, subsets, names))
+        total += len(names)
+    return corrects / total, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cascade outfit classification')
+    parser.add_argument('--small', default=config.CASCADE_SMALL_MODEL_PATH, required=config.CASCADE_SMALL_MODEL_PATH is None)
+    parser.add_argument('--big', default=config.CLOTHE_MODEL_PATH)
+    parser.add_argument('--test', default='dataset/test')
+    parser.add_argument('--margins', type=float, nargs='+', default=[0.1, 0.2, 0.3, 0.5])
+    parser.add_argument('--batch-size', type=int, default=2, help='crops per batch (2 per frame)')
+    args = parser.parse_args()
+
+    small = InferenceSession(args.small)
+    big = InferenceSession(args.big)
+    dataloader = load_dataset(args.test, args.batch_size)
+
+    print(f'{"model":<16}{"skip rate":>11}{"ms/crop":>9}{"p95 ms":>9}{"accuracy":>10}')
+    rows = [('small', small), ('big', big)]
+    rows += [(f'cascade {margin:.2f}', CascadeSession(small, big, margin)) for margin in args.margins]
+    for name, model in rows:
+        accuracy, latencies = run(model, dataloader)
+        skip_rate = model.stats()['skip_rate'] if isinstance(model, CascadeSession) else None
+        skip = f'{skip_rate:>11.2f}' if skip_rate is not None else f'{"-":>11}'
+        print(f'{name:<16}{skip}{1000 * sum(latencies) / len(latencies):>9.1f}'
+              f'{1000 * percentile(latencies, 95):>9.1f}{accuracy:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
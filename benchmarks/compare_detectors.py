@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+compare_detectors.py
+
+Compare the latency and the accuracy of the person detectors (see codes/person_detectors.py)
+on frames recorded with the J-Bot camera
+
+    python3 benchmarks/compare_detectors.py --frames recorded_frames/ --detectors local azure
+
+The accuracy is measured against --labels, a json file {"<frame file name>": [x, y, w, h]}
+(null when nobody is in the frame). Without labels, the boxes of the --reference detector
+are used as ground truth.
+
+'''
+
+## Necessary Packages
+import argparse
+import json
+import os
+import sys
+import time
+from bench_utils import (percentile, list_frames, read_frames)
+from person_detectors import get_detector
+from preprocessing import Frame
+
+EMPTY_BOX = (0, 0, 0, 0)
+
+def iou(box_a, box_b):
+
+    '''
+
+    Args:
+        - box_a, box_b: (x, y, w, h) boxes, (0, 0, 0, 0) when nobody is detected
+    Returns:
+        - (float) intersection over union of both boxes. Two empty boxes agree (1.0)
+
+    '''
+
+    if box_a[2] == 0 and box_b[2] == 0:
+        return 1.0
+    if box_a[2] == 0 or box_b[2] == 0:
+        return 0.0
+
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = inter_w * inter_h
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+def run_detector(name, frames):
+
+    '''
+
+    Args:
+        - name: (str) name of the detector
+        - frames: (list) paths of the recorded frames
+    Returns:
+        - boxes: (dict) frame name -> detected box
+        - latencies: (list) seconds spent on each frame
+
+    '''
+
+    detector = get_detector(name)
+    # The first call pays for the lazy initialization (model weights, connection...)
+    detector.detect(Frame.from_path(frames[0]))
+
+    boxes = {}
+    latencies = []
+    # Decoded outside of the measure, as the camera frames are already decoded.
+    # The remote detectors pay for the JPEG encoding of the camera frames
+    for path, array in zip(frames, read_frames(frames)):
+        frame = Frame(array, 'BGR')
+        since = time.perf_counter()
+        box = detector.detect(frame)
+        latencies.append(time.perf_counter() - since)
+        boxes[os.path.basename(path)] = tuple(box)
+    return boxes, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the person detectors on recorded frames')
+    parser.add_argument('--frames', required=True, help='directory of the recorded frames')
+    parser.add_argument('--detectors', nargs='+', default=['local', 'azure'])
+    parser.add_argument('--labels', help='json file with the ground truth boxes')
+    parser.add_argument('--reference', default='azure', help='detector used as ground truth without --labels')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU above which a detection is correct')
+    args = parser.parse_args()
+
+    frames = list_frames(args.frames)
+    if not frames:
+        sys.exit(f'No frames found in {args.frames}')
+
+    results = {name: run_detector(name, frames) for name in args.detectors}
+
+    if args.labels:
+        with open(args.labels) as f:
+            truth = {k: tuple(v) if v else EMPTY_BOX for k, v in json.load(f).items()}
+        truth_name = os.path.basename(args.labels)
+    elif args.reference in results:
+        truth = results[args.reference][0]
+        truth_name = args.reference
+    else:
+        truth = None
+        truth_name = None
+
+    print(f'{len(frames)} frames, accuracy against {truth_name or "nothing (no labels nor reference)"}')
+    print(f'{"detector":<10}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"detected":>10}{"mean IoU":>10}{"correct":>10}')
+    for name, (boxes, latencies) in results.items():
+        mean_ms = 1000 * sum(latencies) / len(latencies)
+        detected = sum(1 for b in boxes.values() if b[2] > 0) / len(boxes)
+        row = f'{name:<10}{mean_ms:>10.1f}{1000 * percentile(latencies, 50):>10.1f}{1000 * percentile(latencies, 95):>10.1f}{detected:>10.2f}'
+        if truth is not None:
+            ious = [iou(boxes[k], truth[k]) for k in boxes if k in truth]
+            mean_iou = sum(ious) / len(ious) if ious else 0.0
+            correct = sum(1 for v in ious if v >= args.iou) / len(ious) if ious else 0.0
+            row += f'{mean_iou:>10.2f}{correct:>10.2f}'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
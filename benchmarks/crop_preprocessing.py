@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+crop_preprocessing.py
+
+Micro-benchmark of the crop preprocessing: the per-crop transforms.Compose pipeline used
+before (ToPILImage, Resize, Grayscale, ToTensor, Normalize) against the CropPreprocessor of
+codes/preprocessing.py
+
+    python3 benchmarks/crop_preprocessing.py [--image frame.jpg] [--iterations 200]
+
+Without --image, a random 224x224 frame is used.
+
+'''
+
+## Necessary Packages
+import argparse
+import time
+import numpy as np
+from PIL import Image
+import torch
+import torchvision.transforms as transforms
+
+# bench_utils makes the modules of codes/ importable
+import bench_utils
+from preprocessing import CropPreprocessor
+
+def compose_pipeline(frame, boxes):
+
+    '''
+
+    The preprocessing of detectClothes before the CropPreprocessor: one transforms.Compose
+    built per call, and one PIL round trip per crop
+
+    Args:
+        - frame: (numpy.ndarray) HxWx3 uint8 RGB image
+        - boxes: (list) (x1, y1, x2, y2) boxes
+    Returns:
+        - (torch.Tensor) Nx3x100x100 batch
+
+    '''
+
+    trans_params = transforms.Compose([
+                                    transforms.ToPILImage(),
+                                    transforms.Resize((100, 100)),
+                                    transforms.Grayscale(num_output_channels = 3),
+                                    transforms.ToTensor(),
+                                    transforms.Normalize([0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
+    ])
+    return torch.stack([trans_params(frame[y1:y2, x1:x2, :]) for x1, y1, x2, y2 in boxes])
+
+def time_per_call(function, iterations):
+    function()
+    since = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - since) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the crop preprocessing')
+    parser.add_argument('--image', help='camera frame to crop (random 224x224 frame by default)')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.image:
+        frame = np.array(Image.open(args.image).convert('RGB'))
+    else:
+        frame = np.random.RandomState(0).randint(0, 256, (224, 224, 3), dtype=np.uint8)
+
+    # Upper and lower body of a person covering most of the frame, as in detectClothes
+    H, W, _ = frame.shape
+    x, y, w, h = W // 8, H // 16, 3 * W // 4, 7 * H // 8
+    boxes = [(x, y, x + w, int(y + 0.5 * h)), (x, int(y + 0.25 * h), x + w, y + h)]
+
+    preprocessor = CropPreprocessor(size=100)
+
+    reference = compose_pipeline(frame, boxes)
+    batch = preprocessor(frame, boxes)
+    difference = (reference - batch).abs()
+
+    compose_time = time_per_call(lambda: compose_pipeline(frame, boxes), args.iterations)
+    vectorized_time = time_per_call(lambda: preprocessor(frame, boxes), args.iterations)
+
+    print(f'{len(boxes)} crops of a {W}x{H} frame, {args.iterations} iterations')
+    print(f'transforms.Compose: {1000 * compose_time:.3f} ms/call')
+    print(f'CropPreprocessor:   {1000 * vectorized_time:.3f} ms/call ({compose_time / vectorized_time:.1f}x faster)')
+    print(f'Difference on the normalized [-1, 1] inputs: mean {difference.mean().item():.4f}, max {difference.max().item():.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+end_to_end.py
+
+End-to-end latency of every command of J-Bot (trigger_speech, then the synthesis of the
+reply), against the stand-in of the remote services (see api_standin.py)
+
+    python3 benchmarks/end_to_end.py --standin http://localhost:8090 --iterations 50 [--cold]
+
+With --cold, the conditions cache is emptied and the reply is synthesized again (bypassing
+the TTS cache) at every iteration, so every command pays for the remote services. The
+camera command classifies the frames of --frames (random frames by default) with the Azure
+detector of the stand-in, unless --detector local.
+
+'''
+
+## Necessary Packages
+import argparse
+import time
+import numpy as np
+from bench_utils import (percentile, list_frames, read_frames)
+import config
+
+INTENTS = ['greeting', 'weather', 'air pollution', 'camera']
+
+def use_standin(url):
+
+    '''
+
+    Point every remote service of J-Bot to the stand-in
+
+    Args:
+        - url: (str) e.g. 'http://localhost:8090'
+
+    '''
+
+    config.OPENWEATHER_URL = url + '/openweather'
+    config.AIRVISUAL_URL = url + '/airvisual'
+    config.AZURE_ANALYZE_URL = url + '/azure/vision/v3.0/analyze'
+    config.GOOGLE_TTS_URL = url + '/google-tts'
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end latency of the J-Bot commands')
+    parser.add_argument('--standin', default='http://localhost:8090', help="url of api_standin.py, '' for the real APIs")
+    parser.add_argument('--intents', nargs='+', default=INTENTS, choices=INTENTS)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--frames', default=None, help='directory of frames for the camera command')
+    parser.add_argument('--detector', default='azure', help="'azure' (stand-in) or 'local'")
+    parser.add_argument('--voice', default='en-US-Wavenet-F')
+    parser.add_argument('--cold', action='store_true', help='no conditions or TTS cache')
+    args = parser.parse_args()
+
+    # The configuration is changed before the modules of J-Bot use it
+    if args.standin:
+        use_standin(args.standin)
+    config.PERSON_DETECTOR = args.detector
+    if config.LOCATION_OVERRIDE is None:
+        # KAIST, so the benchmark does not depend on the IP geolocation
+        config.LOCATION_OVERRIDE = (36.3721, 127.3604)
+
+    import conditions_cache
+    from jetbot_actions import (trigger_speech, text_to_audio, synthesize, get_clothe_model)
+
+    if args.frames:
+        frames = read_frames(list_frames(args.frames))
+    else:
+        frames = [np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8) for _ in range(8)]
+    if 'camera' in args.intents:
+        get_clothe_model()
+
+    print(f'{"intent":<15}{"n":>5}{"reply p50":>11}{"p95":>8}{"p99":>8}{"total p50":>11}{"p95":>8}{"p99":>8}  (ms)')
+    for intent in args.intents:
+        replies, totals = [], []
+        for i in range(args.iterations):
+            if args.cold:
+                conditions_cache._cache.invalidate()
+            images = [frames[i % len(frames)]] if intent == 'camera' else None
+
+            since = time.perf_counter()
+            text = trigger_speech(intent, images)
+            replied = time.perf_counter()
+            if args.cold:
+                synthesize(args.voice, text)
+            else:
+                text_to_audio(args.voice, text)
+            done = time.perf_counter()
+
+            replies.append(replied - since)
+            totals.append(done - since)
+
+        row = [1000 * percentile(values, q) for values in (replies, totals) for q in (50, 95, 99)]
+        print(f'{intent:<15}{len(totals):>5}{row[0]:>11.1f}{row[1]:>8.1f}{row[2]:>8.1f}'
+              f'{row[3]:>11.1f}{row[4]:>8.1f}{row[5]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+micro_batching.py
+
+Load generator for the micro-batching of the outfit classification (see codes/batching.py).
+Every client stands for a robot asking "how do I look" in a loop: it classifies the upper and
+lower body crops of a synthetic frame and waits for the answer before sending the next one
+
+    python3 benchmarks/micro_batching.py --clients 1 4 8 --duration 10
+
+For each number of clients, the crops are classified directly by the model (each client in
+its own thread) and through the micro-batcher, and the throughput and the latencies of both
+are printed.
+
+'''
+
+## Necessary Packages
+import argparse
+import threading
+import time
+import torch
+from bench_utils import percentile
+import config
+from batching import MicroBatcher
+from clothes_recognition import (TOP_CLASSES, BOT_CLASSES, classifyCrops)
+from inference import InferenceSession
+
+def client(model, duration, latencies):
+
+    '''
+
+    Args:
+        - model: the model classifying the crops (InferenceSession or MicroBatcher)
+        - duration: (float) seconds of load
+        - latencies: (list) seconds of every request, appended to
+
+    '''
+
+    # Synthetic normalized crops, as returned by preprocessing.CropPreprocessor
+    crops = torch.rand(2, 3, 100, 100) * 2 - 1
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        since = time.perf_counter()
+        classifyCrops(crops, model, [TOP_CLASSES, BOT_CLASSES])
+        latencies.append(time.perf_counter() - since)
+
+def load(model, clients, duration):
+
+    '''
+
+    Args:
+        - model: the model classifying the crops (InferenceSession or MicroBatcher)
+        - clients: (int) number of concurrent clients
+        - duration: (float) seconds of load
+    Returns:
+        - (list) seconds of every request of every client
+
+    '''
+
+    latencies = []
+    threads = [threading.Thread(target=client, args=(model, duration, latencies)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the micro-batching of the outfit classification')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per run')
+    parser.add_argument('--max-batch', type=int, default=config.BATCH_MAX_SIZE, help='crops per batch')
+    parser.add_argument('--max-wait', type=float, default=config.BATCH_MAX_WAIT, help='seconds')
+    parser.add_argument('--model', default=config.CLOTHE_MODEL_PATH)
+    args = parser.parse_args()
+
+    session = InferenceSession(args.model)
+
+    print(f'{"clients":>7}  {"mode":<8}{"req/s":>8}{"crops/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"batch":>7}')
+    for clients in args.clients:
+        for mode in ['direct', 'batched']:
+            batcher = MicroBatcher(session, args.max_batch, args.max_wait) if mode == 'batched' else None
+            latencies = load(batcher or session, clients, args.duration)
+            batch_size = batcher.stats()['mean_batch_size'] if batcher else 2
+            if batcher:
+                batcher.close()
+
+            throughput = len(latencies) / args.duration
+            print(f'{clients:>7}  {mode:<8}{throughput:>8.1f}{2 * throughput:>9.1f}'
+                  f'{1000 * percentile(latencies, 50):>9.1f}{1000 * percentile(latencies, 99):>9.1f}'
+                  f'{batch_size:>7.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+model_formats.py
+
+Load time and latency of the outfit classification model in its different formats: the
+pickled model, and the models exported by codes/export_model.py and codes/quantize_model.py
+
+    python3 benchmarks/model_formats.py --models models/clothe_model.pkl models/clothe_model.pt models/clothe_model.onnx
+
+Every model is loaded in an inference.InferenceSession (as on J-Bot), then run on batches of
+upper and lower body crops.
+
+'''
+
+## Necessary Packages
+import argparse
+import time
+import torch
+from bench_utils import percentile
+from inference import InferenceSession
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the formats of the outfit classification model')
+    parser.add_argument('--models', nargs='+', default=['models/clothe_model.pkl', 'models/clothe_model.pt'])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--batch', type=int, default=2, help='crops per batch (2 per frame)')
+    args = parser.parse_args()
+
+    batch = torch.rand(args.batch, 3, 100, 100) * 2 - 1
+
+    print(f'{"model":<32}{"load s":>8}{"warm-up s":>11}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}')
+    for path in args.models:
+        session = InferenceSession(path)
+
+        latencies = []
+        for _ in range(args.iterations):
+            since = time.perf_counter()
+            session(batch)
+            latencies.append(time.perf_counter() - since)
+
+        print(f'{path:<32}{session.load_time:>8.2f}{session.warmup_time:>11.2f}'
+              f'{1000 * sum(latencies) / len(latencies):>10.1f}{1000 * percentile(latencies, 50):>10.1f}'
+              f'{1000 * percentile(latencies, 95):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
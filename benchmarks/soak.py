@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+soak.py
+
+Soak test of the main loop: thousands of simulated commands are given to main.handle_command,
+and the resources of the process are sampled along the way, so whatever a command leaves
+behind (memory, open files, threads, cached audio and traces) shows up before it fills the
+Jetson Nano after days of use
+
+    python3 benchmarks/soak.py --standin http://localhost:8090 --commands 5000 [--csv soak.csv]
+
+    - microphone: the commands are a scripted cycle (greeting, weather, air pollution, camera,
+      not understood, bye-bye)
+    - camera: a fake jetbot camera delivers frames (random, or from --frames) at --fps
+    - speaker: the replies are decoded, but not played (unless --speaker)
+    - remote services: the stand-in of api_standin.py (in replay mode)
+
+The cache and trace files are written to a temporary directory with small limits, so they
+reach their limits during the warm-up. After the warm-up, the growth of each resource is
+estimated by a least squares line over the samples, and the test fails (exit status 1) when a
+resource keeps growing (or the files exceed their limits).
+
+'''
+
+## Necessary Packages
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import wave
+import numpy as np
+from bench_utils import (list_frames, read_frames)
+from end_to_end import use_standin
+import config
+
+# main.py is at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# One cycle of the scripted microphone, None is a sentence that was not understood
+COMMANDS = ['hello robot', 'weather', 'air pollution', 'how do I look', None, 'how do I look', 'bye-bye robot']
+
+# Metric -> (unit, default largest accepted growth after the warm-up)
+METRICS = {'rss': ('MB', 32.0), 'fds': ('', 4.0), 'threads': ('', 2.0), 'disk': ('MB', 1.0)}
+
+
+class FakeCamera:
+
+    '''
+
+    Stand-in for jetbot.Camera: a thread delivers the frames to the observers of 'value',
+    like the capture thread of the real camera
+
+    Args:
+        - frames: (list) HxWx3 BGR frames, delivered in a loop
+        - fps: (float) frames per second
+
+    '''
+
+    def __init__(self, frames, fps):
+        self.frames = frames
+        self.fps = fps
+        self.observers = []
+        self.value = frames[0]
+        self._running = threading.Event()
+        self._thread = None
+
+    def observe(self, callback, names):
+        self.observers.append(callback)
+
+    def unobserve(self, callback, names):
+        self.observers.remove(callback)
+
+    def start(self):
+        self._running.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='fake-camera', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+
+    def _run(self):
+        index = 0
+        while True:
+            self._running.wait()
+            self.value = self.frames[index % len(self.frames)]
+            for callback in list(self.observers):
+                callback({'new': self.value})
+            index += 1
+            time.sleep(1 / self.fps)
+
+
+def fake_play(audio_content, speed):
+
+    '''
+
+    Stand-in for audio_player.play: the wav is decoded, and its duration waited for (scaled
+    by speed, 0 for no wait)
+
+    '''
+
+    with wave.open(io.BytesIO(audio_content), 'rb') as wav:
+        duration = wav.getnframes() / wav.getframerate()
+        wav.readframes(wav.getnframes())
+    time.sleep(duration * speed)
+
+def directory_size(directory):
+
+    '''
+
+    Args:
+        - directory: (str) directory
+    Returns:
+        - (int) bytes of the files in the directory and its sub-directories
+
+    '''
+
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # Evicted or rotated meanwhile
+                pass
+    return total
+
+def sample(commands, since, directory):
+
+    '''
+
+    Args:
+        - commands: (int) commands handled so far
+        - since: (float) time.perf_counter() at the start of the soak
+        - directory: (str) directory of the cache and trace files
+    Returns:
+        - (dict) commands, seconds, rss (MB), fds, threads (native threads) and disk (MB)
+
+    '''
+
+    status = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            status[name] = value.split()
+    return {'commands': commands,
+            'seconds': time.perf_counter() - since,
+            'rss': int(status['VmRSS'][0]) / 1024,
+            'fds': len(os.listdir('/proc/self/fd')),
+            'threads': int(status['Threads'][0]),
+            'disk': directory_size(directory) / 2 ** 20}
+
+def growth(samples, metric):
+
+    '''
+
+    Args:
+        - samples: (list) samples after the warm-up (see sample)
+        - metric: (str) one of METRICS
+    Returns:
+        - (float) growth of the metric over the samples, from a least squares line
+
+    '''
+
+    x = np.array([s['commands'] for s in samples], dtype=float)
+    y = np.array([s[metric] for s in samples], dtype=float)
+    if len(samples) < 2 or x[-1] == x[0]:
+        return 0.0
+    slope = np.polyfit(x, y, 1)[0]
+    return slope * (x[-1] - x[0])
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test of the J-Bot main loop')
+    parser.add_argument('--standin', default='http://localhost:8090', help="url of api_standin.py, '' for the real APIs")
+    parser.add_argument('--commands', type=int, default=5000)
+    parser.add_argument('--sample-every', type=int, default=50, help='commands between two samples')
+    parser.add_argument('--warmup', type=float, default=0.2, help='fraction of the commands not checked')
+    parser.add_argument('--frames', default=None, help='directory of frames for the fake camera')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--detector', default='azure', help="'azure' (stand-in) or 'local'")
+    parser.add_argument('--speaker', action='store_true', help='play the replies on the real output device')
+    parser.add_argument('--playback-speed', type=float, default=0.0,
+                        help='without --speaker, wait this fraction of the duration of each reply')
+    parser.add_argument('--tts-cache-mb', type=float, default=2)
+    parser.add_argument('--trace-mb', type=float, default=0.5)
+    for metric, (unit, limit) in METRICS.items():
+        parser.add_argument(f'--max-{metric}-growth', type=float, default=limit,
+                            help=f'largest accepted growth of {metric} after the warm-up {unit}'.strip())
+    parser.add_argument('--csv', default=None, help='write the samples to this csv file')
+    args = parser.parse_args()
+
+    # The configuration is changed before the modules of J-Bot use it
+    if args.standin:
+        use_standin(args.standin)
+    config.PERSON_DETECTOR = args.detector
+    if config.LOCATION_OVERRIDE is None:
+        config.LOCATION_OVERRIDE = (36.3721, 127.3604)
+    directory = tempfile.mkdtemp(prefix='jbot-soak-')
+    config.TTS_CACHE_DIR = os.path.join(directory, 'tts')
+    config.TTS_CACHE_MAX_BYTES = int(args.tts_cache_mb * 2 ** 20)
+    config.TRACE_FILE = os.path.join(directory, 'traces', 'jbot.trace.json')
+    config.TRACE_MAX_BYTES = int(args.trace_mb * 2 ** 20)
+    config.TRACE_REPORT_EVERY = 0
+    # Largest size of the files: the TTS cache, and the trace file with its backups
+    disk_limit = (config.TTS_CACHE_MAX_BYTES + config.TRACE_MAX_BYTES * (config.TRACE_BACKUPS + 1)) / 2 ** 20
+
+    if args.frames:
+        frames = read_frames(list_frames(args.frames))
+    else:
+        frames = [np.random.randint(0, 256, (224, 224, 3), dtype=np.uint8) for _ in range(8)]
+    import camera_service
+    camera_service.jetbot = types.SimpleNamespace(
+        Camera=types.SimpleNamespace(instance=lambda width, height: FakeCamera(frames, args.fps)))
+    if not args.speaker:
+        from audio_player import audio_player
+        audio_player.play = lambda audio_content: fake_play(audio_content, args.playback_speed)
+
+    import main as jbot
+    jbot.get_clothe_model()
+    jbot.warm_up_camera()
+
+    samples = []
+    count = 0
+    since = time.perf_counter()
+    samples.append(sample(0, since, directory))
+    print(f'{"commands":>9}{"seconds":>9}{"rss MB":>9}{"fds":>6}{"threads":>9}{"disk MB":>9}')
+    try:
+        for i in range(1, args.commands + 1):
+            keyword = COMMANDS[(i - 1) % len(COMMANDS)]
+            count = jbot.handle_command(keyword, count)
+            if i % args.sample_every == 0 or i == args.commands:
+                s = sample(i, since, directory)
+                samples.append(s)
+                print(f'{s["commands"]:>9}{s["seconds"]:>9.0f}{s["rss"]:>9.1f}{s["fds"]:>6}'
+                      f'{s["threads"]:>9}{s["disk"]:>9.2f}')
+    finally:
+        if args.csv:
+            with open(args.csv, 'w') as f:
+                f.write(','.join(samples[0]) + '\n')
+                for s in samples:
+                    f.write(','.join(str(v) for v in s.values()) + '\n')
+        shutil.rmtree(directory, ignore_errors=True)
+
+    checked = [s for s in samples if s['commands'] >= args.warmup * args.commands]
+    failed = False
+    print(f'\nAfter {checked[0]["commands"]} commands of warm-up:')
+    for metric, (unit, _) in METRICS.items():
+        limit = getattr(args, f'max_{metric}_growth')
+        grown = growth(checked, metric)
+        ok = grown <= limit
+        if metric == 'disk' and max(s['disk'] for s in samples) > disk_limit:
+            ok = False
+            print(f'    disk exceeded the limits of the cache and trace files ({disk_limit:.2f} MB)')
+        failed = failed or not ok
+        print(f'    {metric:<8} grew by {grown:>8.2f} {unit:<3} (at most {limit}) {"ok" if ok else "FAILED"}')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
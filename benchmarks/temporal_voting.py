@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+temporal_voting.py
+
+Latency and accuracy of the multi-frame outfit classification (detectClothesMultiFrame) for
+different numbers of voting frames K, on recordings of the J-Bot camera
+
+    python3 benchmarks/temporal_voting.py --recordings recordings/ --k 1 3 5
+
+Every sub-directory of --recordings is one recording of a user: its frames (sorted by name)
+and a label.json file {"top": "shirt", "bot": "shorts"}. Each recording is cut into windows
+of K frames, `--stride` frames apart as in the camera buffer (see config.OUTFIT_VOTE_STRIDE).
+
+'''
+
+## Necessary Packages
+import argparse
+import json
+import os
+import time
+from bench_utils import (percentile, list_frames, read_frames)
+import config
+from clothes_recognition import detectClothesMultiFrame
+from inference import InferenceSession
+
+def load_recordings(directory):
+
+    '''
+
+    Args:
+        - directory: (str) directory of the recordings
+    Returns:
+        - (list) (name, BGR frames, label dict) of every recording
+
+    '''
+
+    recordings = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        label_path = os.path.join(path, 'label.json')
+        if not os.path.isfile(label_path):
+            continue
+        with open(label_path) as f:
+            label = json.load(f)
+        recordings.append((name, read_frames(list_frames(path)), label))
+    return recordings
+
+def windows(frames, k, stride):
+
+    '''
+
+    Args:
+        - frames: (list) frames of a recording
+        - k: (int) frames per window
+        - stride: (int) distance between the frames of a window
+    Returns:
+        - (list) the windows of k frames, each ending one frame later than the previous one
+
+    '''
+
+    span = (k - 1) * stride + 1
+    return [frames[end - span:end:stride] for end in range(span, len(frames) + 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the multi-frame outfit classification')
+    parser.add_argument('--recordings', required=True, help='directory of the labelled recordings')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5], help='numbers of voting frames')
+    parser.add_argument('--stride', type=int, default=config.OUTFIT_VOTE_STRIDE)
+    parser.add_argument('--model', default=config.CLOTHE_MODEL_PATH)
+    parser.add_argument('--detector', default=None, help="'local' or 'azure', config.PERSON_DETECTOR by default")
+    args = parser.parse_args()
+
+    model = InferenceSession(args.model)
+    recordings = load_recordings(args.recordings)
+    if not recordings:
+        raise SystemExit(f'No labelled recording found in {args.recordings}')
+
+    print(f'{len(recordings)} recordings, stride {args.stride}')
+    print(f'{"K":>3}{"windows":>9}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"top acc":>9}{"bot acc":>9}{"no person":>11}')
+    for k in args.k:
+        latencies = []
+        top_correct = bot_correct = missed = 0
+        for _, frames, label in recordings:
+            for window in windows(frames, k, args.stride):
+                since = time.perf_counter()
+                top, bot = detectClothesMultiFrame(window, model, args.detector)
+                latencies.append(time.perf_counter() - since)
+                top_correct += top == label['top']
+                bot_correct += bot == label['bot']
+                missed += top == ''
+
+        if not latencies:
+            print(f'{k:>3}  recordings are too short for {k} frames')
+            continue
+        n = len(latencies)
+        print(f'{k:>3}{n:>9}{1000 * sum(latencies) / n:>10.1f}{1000 * percentile(latencies, 50):>10.1f}'
+              f'{1000 * percentile(latencies, 95):>10.1f}{top_correct / n:>9.2f}{bot_correct / n:>9.2f}{missed / n:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
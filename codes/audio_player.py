@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+audio_player.py
+
+(1) AudioPlayer:
+    - Play wav audio straight from memory on an output stream that stays open between
+      the replies of J-Bot
+
+'''
+
+## Necessary Packages
+import io
+import threading
+import wave
+from startup import lazy_import
+pyaudio = lazy_import('pyaudio')
+
+
+class AudioPlayer:
+
+    '''
+
+    Persistent audio output. The PyAudio stream is opened on the first reply and reused
+    for the next ones, it is only reopened if the format of the audio changes
+
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pyaudio = None
+        self._stream = None
+        self._format = None
+
+    def play(self, audio_content):
+
+        '''
+
+        Play wav audio (e.g. the LINEAR16 response of Google text-to-speech), blocking until
+        it is finished
+
+        Args:
+            audio_content: (bytes) the wav audio, header included
+
+        '''
+
+        with wave.open(io.BytesIO(audio_content), 'rb') as wav:
+            audio_format = (wav.getsampwidth(), wav.getnchannels(), wav.getframerate())
+            frames = wav.readframes(wav.getnframes())
+
+        with self._lock:
+            stream = self._open(audio_format)
+            stream.write(frames)
+
+    def close(self):
+
+        '''
+
+        Release the output device
+
+        '''
+
+        with self._lock:
+            self._close_stream()
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
+                self._pyaudio = None
+
+    def _open(self, audio_format):
+        # Called with the lock held
+        if self._stream is not None and self._format == audio_format:
+            return self._stream
+
+        self._close_stream()
+        if self._pyaudio is None:
+            self._pyaudio = pyaudio.PyAudio()
+        sample_width, channels, rate = audio_format
+        self._stream = self._pyaudio.open(format=self._pyaudio.get_format_from_width(sample_width),
+                                          channels=channels, rate=rate, output=True)
+        self._format = audio_format
+        return self._stream
+
+    def _close_stream(self):
+        # Called with the lock held
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+            self._format = None
+
+
+audio_player = AudioPlayer()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+batching.py
+
+(1) MicroBatcher:
+    - Queue the crops of concurrent callers (several robots) and classify them together, in
+      batches of up to BATCH_MAX_SIZE crops or after BATCH_MAX_WAIT seconds
+(2) get_batcher:
+    - Get the batcher of the shared outfit classification model (created once)
+
+'''
+
+## Necessary Packages
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
+import config
+from inference import (get_session, CascadeSession)
+
+# Queued by close() to stop the worker thread
+STOP = object()
+
+
+class MicroBatcher:
+
+    '''
+
+    Inference service in front of a model. Callers block on `batcher(crops)` as they would on
+    the model itself, while a single worker thread concatenates the queued crops of all the
+    callers, runs one forward pass and hands each caller its own rows of the outputs.
+    A batch is run as soon as it holds `max_batch_size` crops, or `max_wait` seconds after its
+    first request, whichever comes first
+
+    Args:
+        - model: the model called on the batches, usually the inference.InferenceSession
+        - max_batch_size: (int) config.BATCH_MAX_SIZE by default
+        - max_wait: (float) seconds, config.BATCH_MAX_WAIT by default
+
+    '''
+
+    def __init__(self, model, max_batch_size=None, max_wait=None):
+        self.model = model
+        self.load_time = getattr(model, 'load_time', 0.0)
+        self.warmup_time = getattr(model, 'warmup_time', 0.0)
+        self.max_batch_size = max_batch_size or config.BATCH_MAX_SIZE
+        self.max_wait = config.BATCH_MAX_WAIT if max_wait is None else max_wait
+
+        self._queue = queue.Queue()
+        self._carry = None
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._crops = 0
+
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def __call__(self, batch):
+
+        '''
+
+        Args:
+            - batch: (torch.Tensor) Nx3x100x100 preprocessed crops of one caller
+        Returns:
+            - (torch.Tensor) NxC outputs of the model for those crops
+
+        '''
+
+        return self.submit(batch).result()
+
+    def submit(self, batch):
+
+        '''
+
+        Args:
+            - batch: (torch.Tensor) Nx3x100x100 preprocessed crops of one caller
+        Returns:
+            - (concurrent.futures.Future) the NxC outputs of the model for those crops
+
+        '''
+
+        future = Future()
+        # Under the lock, so no request is queued after STOP (its future would never be resolved)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('The micro-batcher is closed')
+            self._queue.put((batch, future))
+        return future
+
+    def close(self):
+
+        '''
+
+        Run the queued crops and stop the worker thread
+
+        '''
+
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(STOP)
+        self._thread.join()
+
+    def stats(self):
+
+        '''
+
+        Returns:
+            - (dict) batches run, crops classified and mean number of crops per batch
+
+        '''
+
+        with self._lock:
+            return {'batches': self._batches,
+                    'crops': self._crops,
+                    'mean_batch_size': self._crops / self._batches if self._batches else None}
+
+    def _next_batch(self):
+        # Block for the first request, then gather the next ones until the batch is full or
+        # the wait is over. A request that would overflow the batch opens the next one
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is STOP:
+            return None
+
+        pending = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is STOP or size + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._next_batch()
+            if pending is None:
+                return
+
+            try:
+                outputs = self.model(torch.cat([batch for batch, _ in pending]))
+                rows = outputs.split([len(batch) for batch, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), output in zip(pending, rows):
+                future.set_result(output)
+
+            with self._lock:
+                self._batches += 1
+                self._crops += len(outputs)
+
+
+batcher = None
+batcher_lock = threading.Lock()
+
+def get_batcher():
+
+    '''
+
+    Get the micro-batcher of the shared outfit classification model (see inference.get_session),
+    for the services classifying the crops of several robots
+
+    Returns:
+        - (MicroBatcher) the shared batcher, or a CascadeSession batching each of its two models
+
+    '''
+
+    global batcher
+    with batcher_lock:
+        if batcher is None:
+            session = get_session()
+            if isinstance(session, CascadeSession):
+                batcher = CascadeSession(MicroBatcher(session.small), MicroBatcher(session.big), session.margin)
+            else:
+                batcher = MicroBatcher(session)
+        return batcher
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+call_policy.py
+
+Every call to a remote service (OpenWeather, AirVisual, IP geolocation, Azure, Google
+text-to-speech) goes through the policy of that service (see config.CALL_POLICIES), so a
+stalled or failing service cannot freeze J-Bot
+
+(1) ServiceUnavailable:
+    - Raised when a call failed and there is no recent enough response to fall back to
+(2) is_retryable:
+    - Whether a failed attempt is worth retrying
+(3) CallPolicy:
+    - Timeout budget, bounded retries with jittered backoff, circuit breaker and fallback to
+      the last good response of a service
+(4) get_policy / policy_stats:
+    - Get the policy of a service (created once), and the counters of every policy
+
+'''
+
+## Necessary Packages
+import random
+import threading
+import time
+from collections import OrderedDict
+import config
+
+
+class ServiceUnavailable(Exception):
+
+    '''
+
+    A remote service failed (or its circuit is open) and no last good response can replace it
+
+    '''
+
+
+def is_retryable(error):
+
+    '''
+
+    Args:
+        - error: (Exception) error of a call
+    Returns:
+        - (bool) False for the HTTP errors that a retry cannot fix (e.g. 401 wrong key, 404)
+
+    '''
+
+    # requests errors carry the response, the errors of the Google Cloud clients
+    # (google.api_core.exceptions, e.g. InvalidArgument, PermissionDenied, Unauthenticated)
+    # carry the equivalent HTTP status as their code
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is None:
+        code = getattr(error, 'code', None)
+        status = code if isinstance(code, int) else None
+    return status is None or status >= 500 or status in (408, 429)
+
+
+class CallPolicy:
+
+    '''
+
+    Call policy of a remote service
+        - Each attempt is given at most `timeout` seconds, and all the attempts of a call at most
+          `budget` seconds
+        - A failed attempt is retried up to `retries` times, after a random backoff between 0 and
+          backoff * 2^attempt seconds (capped by max_backoff), so the clients do not retry together
+        - After `failure_threshold` consecutive failed calls the circuit opens: the calls fail fast
+          without touching the service for `reset_timeout` seconds, then a single trial call
+          decides whether it closes again
+        - A failed call returns the last good response for the same key if it is younger than
+          `fallback_max_age` seconds, otherwise ServiceUnavailable is raised. Only the
+          `config.CALL_FALLBACK_MAX_KEYS` most recent keys are kept
+        - An error that a retry cannot fix (e.g. 400 bad request) raises ServiceUnavailable at
+          once: the service did answer, so it neither opens the circuit nor falls back
+
+    Args:
+        - name: (str) name of the service
+        - timeout, retries, budget, failure_threshold, reset_timeout, fallback_max_age: see above
+        - backoff, max_backoff: (float) seconds, config.CALL_BACKOFF and config.CALL_MAX_BACKOFF by default
+
+    '''
+
+    def __init__(self, name, timeout, retries, budget, failure_threshold, reset_timeout,
+                 fallback_max_age=0, backoff=None, max_backoff=None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.budget = budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fallback_max_age = fallback_max_age
+        self.backoff = config.CALL_BACKOFF if backoff is None else backoff
+        self.max_backoff = config.CALL_MAX_BACKOFF if max_backoff is None else max_backoff
+
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        # key -> (response, time received), least recently received first
+        self._last_good = OrderedDict()
+
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.fallbacks = 0
+        self.rejected = 0
+
+    def call(self, function, key=None):
+
+        '''
+
+        Args:
+            - function: makes one attempt, given the `timeout` (seconds) keyword argument
+            - key: key of the last good response (e.g. the location of a weather request)
+        Returns:
+            - the response of the service, or its last good response for the key
+
+        '''
+
+        with self._lock:
+            self.calls += 1
+            if not self._allow():
+                self.short_circuits += 1
+                error = ServiceUnavailable(f'{self.name} circuit is open')
+                return self._fallback(key, error)
+
+        error = None
+        deadline = time.monotonic() + self.budget
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._lock:
+                self.attempts += 1
+            try:
+                response = function(timeout=min(self.timeout, remaining))
+            except Exception as e:
+                error = e
+                if not is_retryable(e):
+                    with self._lock:
+                        self.rejected += 1
+                        # The service is up: a trial call closes the circuit again
+                        self._state = 'closed'
+                    raise ServiceUnavailable(f'{self.name} refused the call: {e}') from e
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if attempt == self.retries or time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+                continue
+
+            with self._lock:
+                self._state = 'closed'
+                self._consecutive_failures = 0
+                if self.fallback_max_age > 0:
+                    self._remember(key, response)
+            return response
+
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._state == 'half-open' or self._consecutive_failures >= self.failure_threshold:
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+            return self._fallback(key, error or TimeoutError(f'{self.name} budget exhausted'))
+
+    def stats(self):
+
+        '''
+
+        Returns:
+            - (dict) state of the circuit and counters of the calls
+
+        '''
+
+        with self._lock:
+            return {'state': self._state, 'calls': self.calls, 'attempts': self.attempts,
+                    'failures': self.failures, 'short_circuits': self.short_circuits,
+                    'fallbacks': self.fallbacks, 'rejected': self.rejected}
+
+    def _allow(self):
+        # Called with the lock held
+        if self._state == 'open':
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Let a single trial call through
+            self._state = 'half-open'
+            return True
+        if self._state == 'half-open':
+            # The trial call is still running
+            return False
+        return True
+
+    def _remember(self, key, response):
+        # Called with the lock held
+        now = time.monotonic()
+        self._last_good.pop(key, None)
+        self._last_good[key] = (response, now)
+        # Forget the responses too old to fall back to, and the least recent keys
+        while self._last_good:
+            oldest_key, (_, received_at) = next(iter(self._last_good.items()))
+            if now - received_at <= self.fallback_max_age and len(self._last_good) <= config.CALL_FALLBACK_MAX_KEYS:
+                break
+            del self._last_good[oldest_key]
+
+    def _fallback(self, key, error):
+        # Called with the lock held
+        if key in self._last_good:
+            response, received_at = self._last_good[key]
+            age = time.monotonic() - received_at
+            if age <= self.fallback_max_age:
+                self.fallbacks += 1
+                print(f'{self.name} unavailable ({error}), using the response of {age:.0f}s ago')
+                return response
+        raise ServiceUnavailable(f'{self.name} unavailable: {error}') from error
+
+
+policies = {}
+policies_lock = threading.Lock()
+
+def get_policy(name):
+
+    '''
+
+    Args:
+        - name: (str) service in config.CALL_POLICIES, e.g. 'openweather'
+    Returns:
+        - (CallPolicy) the policy shared by every call to the service
+
+    '''
+
+    with policies_lock:
+        if name not in policies:
+            policies[name] = CallPolicy(name, **config.CALL_POLICIES[name])
+        return policies[name]
+
+def policy_stats():
+
+    '''
+
+    Returns:
+        - (dict) service -> CallPolicy.stats of the services called so far
+
+    '''
+
+    with policies_lock:
+        return {name: policy.stats() for name, policy in policies.items()}
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+camera_service.py
+
+(1) CameraService:
+    - Keep the J-Bot camera running and the most recent frames in a ring buffer, so a frame
+      is available the instant the user asks "how do I look"
+
+'''
+
+## Necessary Packages
+import threading
+import time
+from collections import deque
+import config
+from startup import lazy_import
+jetbot = lazy_import('jetbot')
+
+
+class CameraService:
+
+    '''
+
+    Warm camera. The capture thread of the jetbot Camera pushes every new frame (BGR numpy
+    array, used as it is) into a ring buffer of the `buffer_size` most recent frames.
+    The camera observer is registered once, so nothing piles up between requests
+
+    Args:
+        - width: (int) width of the frames
+        - height: (int) height of the frames
+        - buffer_size: (int) number of recent frames kept
+
+    '''
+
+    def __init__(self, width=224, height=224, buffer_size=None):
+        self.width = width
+        self.height = height
+        self.camera = None
+
+        # Re-entrant: the camera may deliver a frame from inside camera.start()
+        self._lock = threading.RLock()
+        self._new_frame = threading.Condition(self._lock)
+        self._frames = deque(maxlen=buffer_size or config.CAMERA_BUFFER_SIZE)
+
+    def start(self):
+
+        '''
+
+        Initiate the camera (slow the first time) and start filling the ring buffer.
+        Calling it again does nothing
+
+        '''
+
+        with self._lock:
+            if self.camera is not None:
+                return
+            camera = jetbot.Camera.instance(width=self.width, height=self.height)
+            camera.observe(self._on_frame, names='value')
+            camera.start()
+            self.camera = camera
+
+    def stop(self):
+
+        '''
+
+        Stop the camera and forget the buffered frames
+
+        '''
+
+        with self._lock:
+            if self.camera is None:
+                return
+            self.camera.unobserve(self._on_frame, names='value')
+            self.camera.stop()
+            self.camera = None
+            self._frames.clear()
+
+    def latest(self, timeout=None):
+
+        '''
+
+        Get the most recent frame, waiting for the first one if the camera just started
+
+        Args:
+            - timeout: (float) seconds to wait for the first frame, config.CAMERA_FRAME_TIMEOUT by default
+        Returns:
+            - (numpy.ndarray) HxWx3 BGR frame
+
+        '''
+
+        return self.recent(1, timeout)[-1]
+
+    def recent(self, k, timeout=None, stride=1):
+
+        '''
+
+        Get the k most recent frames (fewer if the buffer holds fewer)
+
+        Args:
+            - k: (int) number of frames
+            - stride: (int) keep one frame every `stride` frames, so the frames are further apart in time
+            - timeout: (float) seconds to wait for the first frame, config.CAMERA_FRAME_TIMEOUT by default
+        Returns:
+            - (list) HxWx3 BGR frames, oldest first
+
+        '''
+
+        self.start()
+        timeout = config.CAMERA_FRAME_TIMEOUT if timeout is None else timeout
+        with self._new_frame:
+            if not self._new_frame.wait_for(lambda: len(self._frames) > 0, timeout):
+                raise TimeoutError(f'No frame from the camera after {timeout}s')
+            frames = [frame for _, frame in self._frames]
+        return frames[::-1][::stride][:k][::-1]
+
+    def age(self):
+
+        '''
+
+        Returns:
+            - (float) seconds since the most recent frame, None if there is none
+
+        '''
+
+        with self._lock:
+            if not self._frames:
+                return None
+            return time.monotonic() - self._frames[-1][0]
+
+    def _on_frame(self, change):
+        # Called by the capture thread of the camera
+        with self._new_frame:
+            self._frames.append((time.monotonic(), change['new']))
+            self._new_frame.notify_all()
+
+
+camera_service = CameraService()
@@ -14,149 +14,298 @@ Authors:
 clothes_recognition.py
 
 (1) detectPerson: 
-	(a) Given an image, returns the location of a person (if any)
-	(b) Divide the person image into upper body and lower body
+    (a) Given an image, returns the location of a person (if any), using the local or the
+        Azure detector (see person_detectors.py)
+    (b) Divide the person image into upper body and lower body
 (2) detectClothe:
-	(a) Use a pretrained deep learning model to classify and return the clothes of the
-		user for both upper body (shirt, coat, etc) and lower body (shorts, pants..)
+    (a) Use a pretrained deep learning model to classify and return the clothes of the
+        user for both upper body (shirt, coat, etc) and lower body (shorts, pants..)
+(3) classifyCrops:
+    (a) Classify N crops with a single forward pass, each crop against its own classes
+(4) detectClothesMultiFrame:
+    (a) Classify the clothes of the user on K recent frames at once, with a confidence-weighted
+        vote of the frames
+(5) scoreCrops:
+    (a) Probabilities of N crops over their own classes. With an inference.CascadeSession, the
+        big model only runs on the crops where the small model is not confident enough
 '''
 
 ## Necessary Packages
-import numpy as np
-from PIL import Image
-import requests
-import json
 import torch
-import torchvision.transforms as transforms
+from inference import (device, CascadeSession)
+from person_detectors import get_detector
+from preprocessing import (CropPreprocessor, as_frame)
+from tracing import (traced, span)
 
-device = torch.device("cuda" if (torch.cuda.is_available()) else "cpu")
+# Outputs of the model, in the (alphabetical) order of the training folders
+CLASSES = ['long pants', 'shirt', 'shorts', 'thick clothes', 'thin jacket']
 
-def detectPerson(img_path: str):
+# The classes are divided into top and bottom classes
+TOP_CLASSES = ['shirt', 'thick clothes', 'thin jacket']
+BOT_CLASSES = ['long pants', 'shorts']
 
-	'''
+# Our model was training for 100x100x3 images, but you can adjust
+crop_preprocessor = CropPreprocessor(size=100, device=device)
 
-	J-Bot uses Microsoft Azure API to detect the user infront of the camera:
-		https://azure.microsoft.com/en-us/services/cognitive-services/computer-vision/
+# Indices of the class subsets in the outputs of the model (see class_indices)
+subset_indices = {}
 
-	Please sign-up to Azure to get your own subscription key and endpoint url
-	Please also follow the instruction from Microsoft webpage
-		https://docs.microsoft.com/en-us/azure/cognitive-services/Computer-vision/quickstarts/python-disk
+@traced()
+def detectPerson(image, detector=None):
 
-	-----------------------------
+    '''
 
-	This function returns the rectangle that is boxing the detected person on the image (if any)
+    J-Bot detects the user infront of the camera with one of the detectors of person_detectors.py:
+        - 'local': a small torchvision detector running on J-Bot
+        - 'azure': the Microsoft Azure Computer Vision API
+          https://azure.microsoft.com/en-us/services/cognitive-services/computer-vision/
 
-	Args:
-		- img_path: path of the image generated by J-Bot camera
-	Returns:
-		- x: x-coordinate of the top-left corner of the box
-		- y: y-coordinate of the top-left corner of the box
-		- w: Width of the box
-		- h: Height of the box
+    -----------------------------
 
-	'''
+    This function returns the rectangle that is boxing the detected person on the image (if any)
 
-    subscription_key = '' # <Your subscription key>
-    analyze_url = '' # <your endpoint> + 'vision/v3.0/analyze'
+    Args:
+        - image: image generated by J-Bot camera, either the BGR camera frame (numpy.ndarray),
+          a preprocessing.Frame or the path of an image file
+        - detector: (str) 'local' or 'azure', config.PERSON_DETECTOR by default
+    Returns:
+        - x: x-coordinate of the top-left corner of the box
+        - y: y-coordinate of the top-left corner of the box
+        - w: Width of the box
+        - h: Height of the box
 
-    headers = {'Ocp-Apim-Subscription-Key': subscription_key,
-            'Content-Type': 'application/octet-stream'}
-    params = {'visualFeatures': 'Categories,Description,Objects'}
-    
-    with open(img_path, 'rb') as data:
-        response = requests.post(
-          analyze_url, headers=headers, params=params, data=data)
+    '''
 
-    response.raise_for_status()
-    response = response.json()
+    return get_detector(detector).detect(as_frame(image))
 
-    # If there are not response, or the API does not detect a person, return empty coordinates
-    if len(response) == 0:
-        return (0, 0, 0, 0)
-    
-    if 'objects' not in response.keys():
-    	return (0, 0, 0, 0)
+def detectClothes(image, clothe_model):  
+  
+    '''
 
-    person_detected = [d for d in response['objects'] if 'person' in d.values()]
+    Classify the upper and lower clothes of the user given an image (from J-Bot camera).
+    The camera frame is used as it is: it is neither written to disk nor decoded, and only
+    encoded if a remote person detector needs it.
 
-    if len(person_detected) == 0:
-        return (0, 0, 0, 0)
-    
-    # Get the location of the person within the image
-    x, y, w, h = person_detected[0]['rectangle'].values()    
+    Our model was trained with a subset of Large-scale Fashion Database
+        http://mmlab.ie.cuhk.edu.hk/projects/DeepFashion.html
 
-    return (x, y, w, h)
+    Args:
+        - image: image generated by J-Bot camera, either the BGR camera frame (numpy.ndarray),
+          a preprocessing.Frame or the path of an image file
+        - clothe_model: PyTorch model to classify the image, usually the inference.InferenceSession
+    Returns:
+        - top_class: (str) upper body outfit, one of TOP_CLASSES ('' if nobody is detected)
+        - bot_class: (str) lower body outfit, one of BOT_CLASSES ('' if nobody is detected)
 
-def detectClothes(img_path, clothe_model):  
-  
-	'''
+    '''
+
+    frame = as_frame(image)
+
+    # Get the user image
+    x, y, width, height = detectPerson(frame)
+
+    # If no one is detected, returns an empty string
+    if width == 0:
+        return ('', '')
 
-	Classify the upper and lower clothes of the user given an image (from J-Bot camera).
+    # Both crops are preprocessed together (see preprocessing.py)
+    batch = crop_preprocessor(frame.array, body_boxes(x, y, width, height), frame.channel_order)
 
-	Our model was trained with a subset of Large-scale Fashion Database
-		http://mmlab.ie.cuhk.edu.hk/projects/DeepFashion.html
+    # Both crops are classified with a single forward pass
+    top_class, bot_class = classifyCrops(batch, clothe_model, [TOP_CLASSES, BOT_CLASSES])
 
-	Args:
-		- img_path: path of the image generated by J-Bot camera
-		- clothe_model: PyTorch model to classify the image
-	Returns:
-		- x: x-coordinate of the top-left corner of the box
-		- y: y-coordinate of the top-left corner of the box
-		- w: Width of the box
-		- h: Height of the box
+    return (top_class, bot_class)
 
-	'''
+def detectClothesMultiFrame(images, clothe_model, detector=None):
 
-    ori_img =  np.array(Image.open(img_path))
+    '''
 
-    H, _, _ = ori_img.shape
+    Classify the upper and lower clothes of the user given K recent frames of the J-Bot camera,
+    so a blurred frame or a half-turned user does not decide the answer alone.
+        1. The person is detected on the K frames at once
+        2. The 2K crops are classified with a single forward pass
+        3. Each frame votes for its most likely class, weighted by its probability (see vote)
 
-    # Get the user image
-    x, y, width, height = detectPerson(img_path)
+    Args:
+        - images: (list) K images of the same size (BGR camera frames, preprocessing.Frame or paths)
+        - clothe_model: PyTorch model to classify the image, usually the inference.InferenceSession
+        - detector: (str) 'local' or 'azure', config.PERSON_DETECTOR by default
+    Returns:
+        - top_class: (str) upper body outfit, one of TOP_CLASSES ('' if nobody is detected)
+        - bot_class: (str) lower body outfit, one of BOT_CLASSES ('' if nobody is detected)
 
-    # If no one is detected, returns an empty string
-    if width == 0:
+    '''
+
+    frames = [as_frame(image) for image in images]
+    with span('detectPerson', frames=len(frames)):
+        persons = get_detector(detector).detect_batch(frames)
+
+    boxes = []
+    for index, (x, y, width, height) in enumerate(persons):
+        # Frames where no one is detected do not vote
+        if width == 0:
+            continue
+        boxes += [(index,) + box for box in body_boxes(x, y, width, height)]
+
+    if not boxes:
         return ('', '')
 
-    # Separating the upper body from the lower body
-    # Upper-body: Upper half of the whole body
-    # Lower-body: 75% of the body from bottom to top
+    batch = crop_preprocessor.batch([f.array for f in frames], boxes, frames[0].channel_order)
+    scores = scoreCrops(batch, clothe_model, [TOP_CLASSES, BOT_CLASSES] * (len(boxes) // 2))
+
+    top_class = TOP_CLASSES[vote(scores[0::2])]
+    bot_class = BOT_CLASSES[vote(scores[1::2])]
+
+    return (top_class, bot_class)
+
+def body_boxes(x, y, width, height):
+
+    '''
+
+    Separating the upper body from the lower body
+        Upper-body: Upper half of the whole body
+        Lower-body: 75% of the body from bottom to top
+
+    Args:
+        - x, y, width, height: box of the detected person
+    Returns:
+        - (list) the (x1, y1, x2, y2) boxes of the upper body and of the lower body
+
+    '''
+
     x1 = x
     x2 = x + width
     top_y1 = y
     top_y2 = int(y + 0.5 * height)
     bot_y1 = int(y + 0.25 * height)
-    bot_y2 = height
+    bot_y2 = y + height
 
-    top_img = ori_img[top_y1:top_y2, x1:x2, :]
-    bot_img = ori_img[bot_y1:bot_y2, x1:x2, :]
+    return [(x1, top_y1, x2, top_y2), (x1, bot_y1, x2, bot_y2)]
 
-    # The classes are divided into top and bottom classes
-    top_classes = ['shirt', 'thick clothes', 'thin jacket']
-    bot_classes = ['long pants', 'shorts']
+def classifyCrops(inputs, clothe_model, class_subsets):
 
-    # Our model was training for 100x100x3 images, but you can adjust
-    trans_params = transforms.Compose([
-                                    transforms.ToPILImage(),
-                                    transforms.Resize((100, 100)),    
-                                    transforms.Grayscale(num_output_channels = 3),
-                                    transforms.ToTensor(),
-                                    transforms.Normalize([0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
-    ])
+    '''
 
-    top_input = trans_params(top_img).to(device)
-    bot_input = trans_params(bot_img).to(device)
+    Classify N preprocessed crops with a single forward pass of the model. Each crop is
+    only compared against its own subset of classes (e.g. the upper body crop against the
+    upper body classes)
 
-    outputs = clothe_model(top_input.unsqueeze(0)).data[0]
+    Args:
+        - inputs: (torch.Tensor) Nx3x100x100 batch of preprocessed crops (or a list of N
+          3x100x100 tensors)
+        - clothe_model: PyTorch model to classify the image, usually the inference.InferenceSession
+        - class_subsets: (list) N lists of class names (TOP_CLASSES, BOT_CLASSES...)
+    Returns:
+        - (list) N predicted class names
 
-    # Getting the prediction from the deep learning model
-    top_preds = torch.cat([outputs[1].unsqueeze(0), outputs[3:]])
-    _, top_pred = top_preds.data.max(0)
-    top_class = top_classes[top_pred.item()]
+    '''
 
-    bot_preds = torch.cat([outputs[0].unsqueeze(0), outputs[2].unsqueeze(0)])
-    _, bot_pred = bot_preds.data.max(0)
-    bot_class = bot_classes[bot_pred.item()]
+    scores = scoreCrops(inputs, clothe_model, class_subsets)
+    return [subset[probs.argmax().item()] for probs, subset in zip(scores, class_subsets)]
 
-    return (top_class, bot_class)
+def scoreCrops(inputs, clothe_model, class_subsets):
+
+    '''
+
+    Args:
+        - inputs: (torch.Tensor) Nx3x100x100 batch of preprocessed crops (or a list of N
+          3x100x100 tensors)
+        - clothe_model: PyTorch model to classify the image, usually the inference.InferenceSession
+        - class_subsets: (list) N lists of class names (TOP_CLASSES, BOT_CLASSES...)
+    Returns:
+        - (list) N tensors, the softmax probabilities of each crop over its own subset of classes
+
+    '''
+
+    batch = inputs if torch.is_tensor(inputs) else torch.stack(inputs)
+    batch = batch.to(device)
+
+    if isinstance(clothe_model, CascadeSession):
+        return cascadeScores(batch, clothe_model, class_subsets)
+
+    return subsetScores(clothe_model(batch).data, class_subsets)
+
+def cascadeScores(batch, cascade, class_subsets):
+
+    '''
+
+    The small model of the cascade scores every crop. The crops where its two best classes
+    are closer than cascade.margin are scored again, in one batch, by the big model
+
+    Args:
+        - batch: (torch.Tensor) Nx3x100x100 batch of preprocessed crops
+        - cascade: (inference.CascadeSession) the small and the big model
+        - class_subsets: (list) N lists of class names (TOP_CLASSES, BOT_CLASSES...)
+    Returns:
+        - (list) N tensors, the softmax probabilities of each crop over its own subset of classes
+
+    '''
+
+    scores = subsetScores(cascade.small(batch).data, class_subsets)
+
+    uncertain = []
+    for index, probs in enumerate(scores):
+        best, second = probs.topk(2).values.tolist()
+        if best - second < cascade.margin:
+            uncertain.append(index)
+
+    if uncertain:
+        outputs = cascade.big(batch[uncertain]).data
+        rescored = subsetScores(outputs, [class_subsets[index] for index in uncertain])
+        for index, probs in zip(uncertain, rescored):
+            scores[index] = probs
+
+    cascade.record(len(scores), len(uncertain))
+    return scores
+
+def subsetScores(outputs, class_subsets):
+
+    '''
+
+    Args:
+        - outputs: (torch.Tensor) NxC outputs of the model
+        - class_subsets: (list) N lists of class names (TOP_CLASSES, BOT_CLASSES...)
+    Returns:
+        - (list) N tensors, the softmax probabilities of each output over its own subset of classes
+
+    '''
+
+    return [torch.softmax(output[class_indices(subset, output.device)], dim=0)
+            for output, subset in zip(outputs, class_subsets)]
+
+def vote(scores):
+
+    '''
+
+    Confidence-weighted vote: each crop votes for its most likely class with a weight equal
+    to its probability, so confident frames outweigh the blurred ones
+
+    Args:
+        - scores: (list) probabilities of the crops over the same subset of classes
+    Returns:
+        - (int) index of the winning class in the subset
+
+    '''
+
+    ballots = torch.zeros_like(scores[0])
+    for probs in scores:
+        confidence, index = probs.max(0)
+        ballots[index] += confidence
+    return ballots.argmax().item()
+
+def class_indices(subset, on_device=device):
+
+    '''
+
+    Args:
+        - subset: (list) class names, e.g. TOP_CLASSES
+        - on_device: (torch.device) device of the outputs of the model
+    Returns:
+        - (torch.Tensor) indices of those classes in the outputs of the model
+
+    '''
 
+    key = (tuple(subset), str(on_device))
+    if key not in subset_indices:
+        subset_indices[key] = torch.tensor([CLASSES.index(c) for c in subset], device=on_device)
+    return subset_indices[key]
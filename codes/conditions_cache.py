@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+conditions_cache.py
+
+(1) ConditionsCache:
+    - Keep the last weather and air quality conditions of each location in memory, refreshing
+      them in the background once they get stale. Concurrent requests for the same location
+      share a single call to the APIs
+(2) location_key:
+    - Round a location, so the nearby robots share the same conditions
+(3) get_cached_condition:
+    - Get the conditions outside from the process-wide cache
+(4) cache_stats:
+    - Get the hit / miss / age counters of the process-wide cache
+
+'''
+
+## Necessary Packages
+import threading
+import time
+from concurrent.futures import Future
+import config
+from weather_callAPI import get_outside_condition
+
+def location_key(location, decimals=None):
+
+    '''
+
+    Args:
+        - location: (lat, lon) of the robot, None for this J-Bot
+        - decimals: (int) decimals kept, config.CONDITIONS_LOCATION_DECIMALS by default
+    Returns:
+        - (tuple) the rounded (lat, lon), None for this J-Bot
+
+    '''
+
+    if location is None:
+        return None
+    decimals = config.CONDITIONS_LOCATION_DECIMALS if decimals is None else decimals
+    lat, lon = location
+    return (round(float(lat), decimals), round(float(lon), decimals))
+
+
+class ConditionsCache:
+
+    '''
+
+    Process-wide cache for the conditions outside (stale-while-revalidate), per rounded location
+        - Younger than `ttl`: the conditions are answered from memory
+        - Between `ttl` and `max_stale`: the stale conditions are answered from memory and
+          a background thread fetches new ones
+        - Older than `max_stale` (or empty): the conditions are fetched before answering
+
+    The calls to the APIs are single-flight: while the conditions of a location are being
+    fetched, the other requests for that location wait for the same call instead of starting
+    their own (counted in `coalesced`)
+
+    Args:
+        - loader: (function) returns the processed conditions, e.g. get_outside_condition.
+          It is given the location, when there is one
+        - ttl: (float) seconds during which the conditions are fresh
+        - max_stale: (float) seconds during which stale conditions can still be answered
+
+    '''
+
+    def __init__(self, loader, ttl, max_stale):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+
+        self._lock = threading.Lock()
+        # location key -> (conditions, time fetched)
+        self._entries = {}
+        # location key -> Future of the call to the APIs in progress
+        self._inflight = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def get(self, location=None):
+
+        '''
+
+        Get the conditions outside. The returned dict is shared between the callers,
+        so it must not be modified
+
+        Args:
+            - location: (lat, lon) of the robot, None for this J-Bot
+        Returns:
+            - (dict) Processed weather information
+
+        '''
+
+        key = location_key(location)
+        with self._lock:
+            if key in self._entries:
+                value, fetched_at = self._entries[key]
+                age = time.monotonic() - fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return value
+                if age < self.max_stale:
+                    self.stale_hits += 1
+                    self._start_refresh(key, location)
+                    return value
+            self.misses += 1
+            future, leader = self._join_flight(key)
+
+        # Nothing usable in memory, the user has to wait for the APIs (or for the call
+        # already made by another request)
+        if leader:
+            self._load(key, location, future)
+        return future.result()
+
+    def invalidate(self):
+
+        '''
+
+        Drop the cached conditions, the next calls fetch them again
+
+        '''
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+
+        '''
+
+        Get the counters of the cache
+
+        Returns:
+            - (dict) hits, stale_hits, misses, refreshes, refresh_errors, upstream_calls,
+              coalesced (calls to the APIs saved by the single-flight), locations (cached) and
+              age (seconds since the conditions of this J-Bot were fetched, None if empty)
+
+        '''
+
+        with self._lock:
+            age = None
+            if None in self._entries:
+                age = time.monotonic() - self._entries[None][1]
+            return {'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses,
+                    'refreshes': self.refreshes, 'refresh_errors': self.refresh_errors,
+                    'upstream_calls': self.upstream_calls, 'coalesced': self.coalesced,
+                    'locations': len(self._entries), 'age': age}
+
+    def _join_flight(self, key):
+        # Called with the lock held. Returns the Future of the call in progress for the
+        # location, and whether the caller has to make that call (leader)
+        if key in self._inflight:
+            self.coalesced += 1
+            return self._inflight[key], False
+        future = Future()
+        self._inflight[key] = future
+        self.upstream_calls += 1
+        return future, True
+
+    def _load(self, key, location, future):
+        try:
+            value = self.loader() if location is None else self.loader(location)
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            del self._inflight[key]
+        future.set_result(value)
+
+    def _start_refresh(self, key, location):
+        # Called with the lock held: only one call per location runs at a time
+        if key in self._inflight:
+            return
+        future, _ = self._join_flight(key)
+        threading.Thread(target=self._refresh, args=(key, location, future),
+                         name='conditions-refresh', daemon=True).start()
+
+    def _refresh(self, key, location, future):
+        self._load(key, location, future)
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.refreshes += 1
+            else:
+                self.refresh_errors += 1
+        if error is not None:
+            # Keep answering the stale conditions, the next request tries again
+            print(f'Could not refresh the conditions outside: {error}')
+
+
+_cache = ConditionsCache(get_outside_condition, config.CONDITIONS_TTL, config.CONDITIONS_MAX_STALE)
+
+def get_cached_condition(location=None):
+
+    '''
+
+    Get the conditions outside from the process-wide cache
+
+    Args:
+        - location: (lat, lon) of the robot, None for this J-Bot
+    Returns:
+        - d: (dict) Processed weather information (shared, must not be modified)
+
+    '''
+
+    return _cache.get(location)
+
+def cache_stats():
+
+    '''
+
+    Get the hit / miss / age counters of the process-wide conditions cache
+
+    Returns:
+        - (dict) see ConditionsCache.stats
+
+    '''
+
+    return _cache.stats()
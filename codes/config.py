@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+config.py
+
+Settings shared by the J-Bot modules. Edit the values below to tune the J-Bot
+for your own robot.
+
+'''
+
+## Start-up
+# Load the outfit model and the camera on a background thread while J-Bot already listens.
+# False loads them before listening
+BACKGROUND_WARM_UP = True
+# The outfit classification model: the pickled fp32 model, or an exported one such as
+# 'models/clothe_model.pt' / 'models/clothe_model.onnx' (export_model.py) or the int8
+# 'models/clothe_model_int8.pt' (quantize_model.py)
+CLOTHE_MODEL_PATH = 'models/clothe_model.pkl'
+
+## Camera (see camera_service.py)
+# Number of recent frames kept in memory
+CAMERA_BUFFER_SIZE = 8
+# Seconds to wait for the first frame when the camera just started
+CAMERA_FRAME_TIMEOUT = 5
+
+## Outfit classification
+# CPU threads used by the model (the Jetson Nano has 4 cores)
+INFERENCE_THREADS = 4
+# Run the convolutions in the channels-last memory layout (measure it on your device first)
+INFERENCE_CHANNELS_LAST = False
+# Forward passes run when the model is loaded, so the first user does not pay for them
+INFERENCE_WARMUP_RUNS = 2
+# Quantized kernels: 'qnnpack' for the ARM CPU of the Jetson, 'fbgemm' for x86 CPUs
+QUANTIZED_ENGINE = 'qnnpack'
+# Small model answering first (e.g. 'models/clothe_model_small.pkl' of train_small_model.py).
+# None to always run the CLOTHE_MODEL_PATH model
+CASCADE_SMALL_MODEL_PATH = None
+# The CLOTHE_MODEL_PATH model only runs on the crops where the probability of the best class of
+# the small model is less than CASCADE_MARGIN above the second best (see benchmarks/cascade.py)
+CASCADE_MARGIN = 0.3
+# Number of recent camera frames voting for the outfit (1 classifies the latest frame only)
+OUTFIT_VOTE_FRAMES = 3
+# Distance between the voting frames in the camera buffer (K frames need a buffer of at least
+# (K - 1) * stride + 1 frames)
+OUTFIT_VOTE_STRIDE = 3
+
+## Micro-batching of the outfit classification (see batching.py)
+# Largest number of crops classified in one forward pass
+BATCH_MAX_SIZE = 16
+# Seconds the first queued crop waits for the crops of other callers before its batch runs
+BATCH_MAX_WAIT = 0.01
+
+## Weather and air quality conditions cache
+# Seconds during which the cached conditions are answered without touching the APIs
+CONDITIONS_TTL = 600
+# Seconds after which stale conditions are no longer served while refreshing in the background.
+# Older conditions are fetched again before answering the user
+CONDITIONS_MAX_STALE = 3 * 60 * 60
+# Decimals kept from the location of the robots asking for the conditions (1 decimal is about
+# 11 km): the robots in the same rounded location share the same conditions and API calls
+CONDITIONS_LOCATION_DECIMALS = 1
+
+## Geolocation
+# Static (latitude, longitude) of the J-Bot, e.g. (36.3721, 127.3604). None to locate it by IP
+LOCATION_OVERRIDE = None
+# File storing the IP geolocation between runs
+LOCATION_CACHE_FILE = 'cache/location.json'
+# Seconds after which the stored geolocation is looked up again
+LOCATION_CACHE_TTL = 7 * 24 * 60 * 60
+
+## Speech recognition (see speech_listener.py)
+# Seconds of ambient noise recorded once at start-up to set the energy threshold of the microphone
+SPEECH_CALIBRATION_SECONDS = 1
+# Longest phrase, in seconds (the commands are a few words)
+SPEECH_PHRASE_TIME_LIMIT = 5
+SPEECH_LANGUAGE = 'en-US'
+# Seconds to wait for Google speech recognition
+SPEECH_RECOGNITION_TIMEOUT = 5
+# Recognized commands kept while J-Bot is busy, the oldest ones are dropped first
+SPEECH_QUEUE_SIZE = 4
+
+## Text-to-speech
+# Your Google Cloud Platform authentication file
+GOOGLE_CREDENTIALS_FILE = '<YOUR_AUTHENTICATION_FILE.json>'
+# Sentences synthesized at the same time while J-Bot speaks (see speaker.py)
+SPEAKER_SYNTHESIS_WORKERS = 2
+# Directory storing the synthesized sentences
+TTS_CACHE_DIR = 'cache/tts'
+# Maximum size of the directory, the least recently played sentences are removed first
+TTS_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+## Person detection (see person_detectors.py)
+# 'local' runs a torchvision detector on J-Bot (torchvision >= 0.8), 'azure' uses the Microsoft Azure API
+PERSON_DETECTOR = 'local'
+# Detection model in torchvision.models.detection, and minimum confidence of a person
+LOCAL_DETECTOR_MODEL = 'fasterrcnn_mobilenet_v3_large_320_fpn'
+LOCAL_DETECTOR_SCORE = 0.5
+# Your Microsoft Azure subscription key, and <your endpoint> + 'vision/v3.0/analyze'
+# ('http://localhost:8090/azure/vision/v3.0/analyze' for the stand-in server)
+AZURE_SUBSCRIPTION_KEY = ''
+AZURE_ANALYZE_URL = ''
+# Azure calls in flight at once, e.g. for the OUTFIT_VOTE_FRAMES frames of "how do I look"
+AZURE_CONCURRENT_REQUESTS = 4
+
+## Remote services
+# Base urls of the APIs. Point them to the stand-in server of benchmarks/api_standin.py
+# (e.g. 'http://localhost:8090/openweather') to replay recorded responses
+OPENWEATHER_URL = 'https://api.openweathermap.org'
+AIRVISUAL_URL = 'http://api.airvisual.com'
+# REST endpoint of Google text-to-speech, e.g. 'http://localhost:8090/google-tts' for the
+# stand-in server. None uses the Google Cloud client (GOOGLE_CREDENTIALS_FILE)
+GOOGLE_TTS_URL = None
+# Threads fetching the weather and the air quality, and keep-alive connections kept per API
+# host (see weather_callAPI.py). Every command fetches both at once, so weather_callAPI.py
+# uses at least 2 * SERVICE_WORKERS of each
+FETCH_WORKERS = 16
+HTTP_POOL_SIZE = 16
+
+## Calls to the remote services (see call_policy.py)
+# Per service: seconds per attempt (timeout), retries after a failed attempt, seconds for all the
+# attempts of a call (budget), consecutive failed calls opening the circuit (failure_threshold),
+# seconds before a trial call once open (reset_timeout), and maximum age in seconds of the last
+# good response answered instead of a failed call (fallback_max_age, 0 never falls back)
+CALL_POLICIES = {
+    'openweather': {'timeout': 3, 'retries': 2, 'budget': 8, 'failure_threshold': 3,
+                    'reset_timeout': 60, 'fallback_max_age': 3 * 60 * 60},
+    'airvisual': {'timeout': 3, 'retries': 2, 'budget': 8, 'failure_threshold': 3,
+                  'reset_timeout': 60, 'fallback_max_age': 3 * 60 * 60},
+    'geolocation': {'timeout': 3, 'retries': 1, 'budget': 6, 'failure_threshold': 3,
+                    'reset_timeout': 300, 'fallback_max_age': 24 * 60 * 60},
+    # The person box of another frame is never valid for a new frame
+    'azure': {'timeout': 3, 'retries': 1, 'budget': 5, 'failure_threshold': 3,
+              'reset_timeout': 30, 'fallback_max_age': 0},
+    'google_tts': {'timeout': 5, 'retries': 2, 'budget': 10, 'failure_threshold': 3,
+                   'reset_timeout': 30, 'fallback_max_age': 0},
+}
+# Seconds of the jittered exponential backoff between the attempts, and its maximum
+CALL_BACKOFF = 0.2
+CALL_MAX_BACKOFF = 2
+# Keys (e.g. locations) whose last good response is kept for the fallback, per service
+CALL_FALLBACK_MAX_KEYS = 64
+
+## Command service (see service.py)
+SERVICE_HOST = '0.0.0.0'
+SERVICE_PORT = 8080
+# Threads running the blocking work of the requests (APIs, outfit model, text-to-speech)
+SERVICE_WORKERS = 8
+# Voice of the spoken replies (?audio=1)
+SERVICE_VOICE = 'en-US-Wavenet-F'
+# Largest accepted request body (uploaded images), in bytes
+SERVICE_MAX_UPLOAD = 8 * 1024 * 1024
+# Largest accepted uploaded image, in bytes
+SERVICE_MAX_IMAGE = 4 * 1024 * 1024
+
+## Tracing (see tracing.py)
+TRACING_ENABLED = True
+# Chrome trace event file of the spans (chrome://tracing or https://ui.perfetto.dev),
+# rolled over to TRACE_FILE.1 ... TRACE_FILE.<TRACE_BACKUPS> once larger than TRACE_MAX_BYTES
+TRACE_FILE = 'cache/traces/jbot.trace.json'
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+# main.py prints the latency of every stage every TRACE_REPORT_EVERY commands (0: never)
+TRACE_REPORT_EVERY = 10
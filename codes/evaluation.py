@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+evaluation.py
+
+Helpers to evaluate the outfit classification models on our DeepFashion subset, ordered as
+described in the README (dataset/train/<class>, dataset/test/<class>)
+
+(1) load_dataset:
+    - Load a folder of the dataset with the transforms used in model_evaluation.ipynb
+(2) evaluate:
+    - Accuracy and per-batch latency of a model on a folder of the dataset
+
+'''
+
+## Necessary Packages
+import time
+import torch
+import torchvision.transforms as transforms
+from torch.utils.data import DataLoader
+from torchvision.datasets import ImageFolder
+from inference import inference_context
+
+# Accuracy of the ResNet50 model in model_evaluation.ipynb (10-fold cross-validation)
+BASELINE_ACCURACY = 0.81
+
+def load_dataset(folder, batch_size=32, shuffle=False):
+
+    '''
+
+    Args:
+        - folder: (str) e.g. 'dataset/test'
+        - batch_size: (int) images per batch
+        - shuffle: (bool) shuffle the images (e.g. to calibrate on a varied subset)
+    Returns:
+        - (torch.utils.data.DataLoader) the transformed images and their labels
+
+    '''
+
+    trans_params = transforms.Compose([
+               transforms.Resize((100, 100)),
+               transforms.Grayscale(num_output_channels = 3),
+               transforms.ToTensor(),
+               transforms.Normalize([0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
+    ])
+    dataset = ImageFolder(folder, trans_params)
+    return DataLoader(dataset, batch_size = batch_size, num_workers = 2, shuffle = shuffle)
+
+def evaluate(model, dataloader, device=torch.device('cpu')):
+
+    '''
+
+    Args:
+        - model: the model (or inference session) to evaluate, called on a batch of images
+        - dataloader: (torch.utils.data.DataLoader) from load_dataset
+        - device: (torch.device) device of the model
+    Returns:
+        - accuracy: (float) share of the images classified correctly (over the 5 classes)
+        - latency: (float) mean seconds per batch
+
+    '''
+
+    corrects, total, elapsed, batches = 0, 0, 0.0, 0
+    with inference_context():
+        for inputs, labels in dataloader:
+            since = time.perf_counter()
+            outputs = model(inputs.to(device))
+            elapsed += time.perf_counter() - since
+            batches += 1
+
+            _, preds = outputs.max(1)
+            corrects += torch.sum(preds.cpu() == labels).item()
+            total += labels.size(0)
+
+    return corrects / total, elapsed / batches
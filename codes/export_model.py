@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+export_model.py
+
+Export the pickled outfit classification model to a frozen graph, which loads without the
+Python classes of the model and does not depend on the exact torch version of the training
+
+    python3 codes/export_model.py --format torchscript
+    python3 codes/export_model.py --format onnx
+
+Set CLOTHE_MODEL_PATH in config.py to the exported file to use it, and compare the load time
+and the latency of the models with benchmarks/model_formats.py
+
+(1) export_torchscript:
+    - Trace, freeze and optimize the model for the CPU (TorchScript)
+(2) export_onnx:
+    - Export the model to ONNX, run by ONNX Runtime (see inference.OnnxModel)
+
+'''
+
+## Necessary Packages
+import argparse
+import json
+import os
+import torch
+from inference import (inference_context, metadata_path, load_model)
+
+# Upper and lower body crops of one frame
+EXAMPLE_SHAPE = (2, 3, 100, 100)
+
+def export_torchscript(model, path):
+
+    '''
+
+    Args:
+        - model: (torch.nn.Module) the fp32 model, on the CPU
+        - path: (str) e.g. 'models/clothe_model.pt'
+    Returns:
+        - (dict) metadata of the exported model
+
+    '''
+
+    with inference_context():
+        scripted = torch.jit.trace(model, torch.zeros(EXAMPLE_SHAPE))
+    # Fold the batch norms and the constant weights into the graph
+    scripted = torch.jit.freeze(scripted)
+    if hasattr(torch.jit, 'optimize_for_inference'):
+        # torch >= 1.10: CPU-specific rewrites, the model has to stay on the CPU
+        scripted = torch.jit.optimize_for_inference(scripted)
+    scripted.save(path)
+    return {'format': 'torchscript', 'device': 'cpu', 'torch': torch.__version__}
+
+def export_onnx(model, path, opset=11):
+
+    '''
+
+    Args:
+        - model: (torch.nn.Module) the fp32 model, on the CPU
+        - path: (str) e.g. 'models/clothe_model.onnx'
+        - opset: (int) ONNX operator set version
+    Returns:
+        - (dict) metadata of the exported model
+
+    '''
+
+    with inference_context():
+        torch.onnx.export(model, torch.zeros(EXAMPLE_SHAPE), path,
+                          input_names=['crops'], output_names=['scores'],
+                          dynamic_axes={'crops': {0: 'batch'}, 'scores': {0: 'batch'}},
+                          opset_version=opset)
+    return {'format': 'onnx', 'device': 'cpu', 'opset': opset}
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the outfit classification model')
+    parser.add_argument('--model', default='models/clothe_model.pkl', help='fp32 pickled model')
+    parser.add_argument('--format', choices=['torchscript', 'onnx'], default='torchscript')
+    parser.add_argument('--output', default=None,
+                        help="'models/clothe_model.pt' (torchscript) or 'models/clothe_model.onnx' by default")
+    args = parser.parse_args()
+
+    extension = '.onnx' if args.format == 'onnx' else '.pt'
+    output = args.output or os.path.splitext(args.model)[0] + extension
+
+    model = torch.load(args.model, map_location='cpu').eval()
+    for p in model.parameters():
+        p.requires_grad_(False)
+
+    if args.format == 'onnx':
+        metadata = export_onnx(model, output)
+    else:
+        metadata = export_torchscript(model, output)
+    metadata['source'] = os.path.basename(args.model)
+    with open(metadata_path(output), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    print(f'Exported to {output}')
+
+    # The exported model has to give the outputs of the pickled one
+    exported, _ = load_model(output)
+    batch = torch.rand(EXAMPLE_SHAPE) * 2 - 1
+    with inference_context():
+        difference = (exported(batch) - model(batch)).abs().max().item()
+    print(f'Largest difference with the pickled model: {difference:.2e}')
+
+
+if __name__ == '__main__':
+    main()
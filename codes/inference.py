@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+inference.py
+
+(1) device:
+    - The device (GPU of the Jetson if available, CPU otherwise) used by every model of J-Bot
+(2) inference_context:
+    - Context disabling autograd (inference mode when the torch version has it)
+(3) configure_threads:
+    - Pin the number of CPU threads used by torch
+(4) OnnxModel:
+    - Run an ONNX model (exported by export_model.py) with ONNX Runtime on the CPU
+(5) load_model:
+    - Load a pickled model, or a model exported by export_model.py or quantize_model.py
+      (TorchScript or ONNX) described by its metadata file
+(6) InferenceSession:
+    - Own the outfit classification model: eval mode, no autograd, thread configuration,
+      optional channels-last layout and warm-up at load
+(7) CascadeSession:
+    - A small model answering first and the big model answering the uncertain crops only
+(8) get_session:
+    - Get the session shared by jetbot_actions and clothes_recognition (loaded once)
+
+'''
+
+## Necessary Packages
+import json
+import os
+import threading
+import time
+import torch
+import config
+from startup import lazy_import
+from tracing import span
+onnxruntime = lazy_import('onnxruntime')
+
+device = torch.device("cuda" if (torch.cuda.is_available()) else "cpu")
+
+def inference_context():
+
+    '''
+
+    Returns:
+        - context manager disabling autograd: torch.inference_mode (torch >= 1.9) or torch.no_grad
+
+    '''
+
+    if hasattr(torch, 'inference_mode'):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+threads_configured = False
+
+def configure_threads(threads=None):
+
+    '''
+
+    Pin the number of threads used by torch on the CPU (the 4 cores of the Jetson Nano by default).
+    The inter-op threads can only be set before the first parallel work, so it is done once
+
+    Args:
+        - threads: (int) intra-op threads, config.INFERENCE_THREADS by default
+
+    '''
+
+    global threads_configured
+    threads = threads or config.INFERENCE_THREADS
+    torch.set_num_threads(threads)
+    if not threads_configured:
+        threads_configured = True
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Parallel work already started, the default is kept
+            pass
+
+def metadata_path(model_path):
+
+    '''
+
+    Args:
+        - model_path: (str) path of an exported model, e.g. 'models/clothe_model_int8.pt'
+    Returns:
+        - (str) path of its metadata file, e.g. 'models/clothe_model_int8.pt.json'
+
+    '''
+
+    return model_path + '.json'
+
+
+class OnnxModel:
+
+    '''
+
+    ONNX model run by ONNX Runtime, an alternative CPU runtime: the graph is optimized once
+    at load and the inference does not go through the Python modules of PyTorch.
+    Called like a PyTorch model, on a batch of crops
+
+    Args:
+        - model_path: (str) e.g. 'models/clothe_model.onnx'
+        - threads: (int) intra-op CPU threads, config.INFERENCE_THREADS by default
+
+    '''
+
+    def __init__(self, model_path, threads=None):
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or config.INFERENCE_THREADS
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+
+        '''
+
+        Args:
+            - batch: (torch.Tensor) Nx3x100x100 preprocessed crops
+        Returns:
+            - (torch.Tensor) NxC outputs of the model
+
+        '''
+
+        inputs = batch.detach().cpu().numpy()
+        return torch.from_numpy(self.session.run(None, {self.input_name: inputs})[0])
+
+def load_model(model_path):
+
+    '''
+
+    Load a model of J-Bot
+        - '*.pkl': pickled PyTorch model (models/clothe_model.pkl)
+        - '*.onnx': ONNX model, run by ONNX Runtime (see OnnxModel)
+        - any other file: TorchScript model
+    The exported models have a metadata json file next to them (written by export_model.py and
+    quantize_model.py), e.g. {"format": "torchscript", "quantized": true, "engine": "qnnpack"}
+
+    Args:
+        - model_path: (str) path of the model
+    Returns:
+        - model: the loaded model
+        - metadata: (dict) the metadata of the model ({} if there is none)
+
+    '''
+
+    if model_path.endswith('.pkl'):
+        return torch.load(model_path, map_location=device), {}
+
+    metadata = {}
+    if os.path.isfile(metadata_path(model_path)):
+        with open(metadata_path(model_path)) as f:
+            metadata = json.load(f)
+
+    if model_path.endswith('.onnx'):
+        return OnnxModel(model_path), metadata
+
+    if metadata.get('quantized'):
+        # The int8 kernels run on the CPU, with the engine the model was calibrated for
+        torch.backends.quantized.engine = metadata.get('engine', config.QUANTIZED_ENGINE)
+        return torch.jit.load(model_path, map_location='cpu'), metadata
+    if metadata.get('device') == 'cpu':
+        # Optimized for the CPU at export (e.g. MKL-DNN convolutions)
+        return torch.jit.load(model_path, map_location='cpu'), metadata
+    return torch.jit.load(model_path, map_location=device), metadata
+
+
+class InferenceSession:
+
+    '''
+
+    Owner of the outfit classification model. Calling the session runs the model on a batch:
+        - in eval mode and without autograd
+        - on `device`, in the channels-last memory layout if enabled (faster convolutions on
+          some CPUs and GPUs)
+    The model is run `warmup_runs` times at load, so the first user does not pay for the lazy
+    initialization of the kernels
+
+    Args:
+        - model_path: (str) model loaded by load_model, config.CLOTHE_MODEL_PATH by default
+        - threads: (int) intra-op CPU threads, config.INFERENCE_THREADS by default
+        - channels_last: (bool) config.INFERENCE_CHANNELS_LAST by default
+        - warmup_runs: (int) config.INFERENCE_WARMUP_RUNS by default
+        - input_shape: (tuple) shape of the warm-up batch (upper and lower body crops)
+        - model: (torch.nn.Module) an already loaded model, instead of model_path
+
+    '''
+
+    def __init__(self, model_path=None, threads=None, channels_last=None, warmup_runs=None,
+                 input_shape=(2, 3, 100, 100), model=None):
+        self.model_path = model_path or config.CLOTHE_MODEL_PATH
+        self.channels_last = config.INFERENCE_CHANNELS_LAST if channels_last is None else channels_last
+        warmup_runs = config.INFERENCE_WARMUP_RUNS if warmup_runs is None else warmup_runs
+
+        configure_threads(threads)
+
+        since = time.perf_counter()
+        self.metadata = {}
+        if model is None:
+            model, self.metadata = load_model(self.model_path)
+
+        # Quantized, CPU-optimized and ONNX models only run on the CPU
+        is_torch = isinstance(model, torch.nn.Module)
+        on_cpu = self.metadata.get('quantized') or self.metadata.get('device') == 'cpu' or not is_torch
+        self.device = torch.device('cpu') if on_cpu else device
+        if self.metadata.get('quantized') or not is_torch:
+            self.channels_last = False
+
+        if is_torch:
+            model = model.to(self.device).eval()
+            for p in model.parameters():
+                p.requires_grad_(False)
+            if self.channels_last:
+                model = model.to(memory_format=torch.channels_last)
+        self.model = model
+        self.load_time = time.perf_counter() - since
+
+        since = time.perf_counter()
+        for _ in range(warmup_runs):
+            self(torch.zeros(input_shape))
+        self.warmup_time = time.perf_counter() - since
+
+    def __call__(self, batch):
+
+        '''
+
+        Args:
+            - batch: (torch.Tensor) Nx3x100x100 preprocessed crops
+        Returns:
+            - (torch.Tensor) NxC outputs of the model
+
+        '''
+
+        # Nothing may put the shared model back in training mode (dropout, batch norm updates)
+        if getattr(self.model, 'training', False):
+            self.model.eval()
+
+        with span('inference', model=os.path.basename(self.model_path), crops=len(batch)):
+            with inference_context():
+                batch = batch.to(self.device)
+                if self.channels_last:
+                    batch = batch.contiguous(memory_format=torch.channels_last)
+                return self.model(batch)
+
+
+class CascadeSession:
+
+    '''
+
+    Two-stage outfit classification: the small model classifies every crop, and the big model
+    only the crops on which the small one hesitates (see clothes_recognition.scoreCrops)
+
+    Args:
+        - small: (InferenceSession) fast model answering first
+        - big: (InferenceSession) accurate model (the ResNet50)
+        - margin: (float) the big model runs when the probability of the best class of the
+          small model is less than `margin` above the second best, config.CASCADE_MARGIN by default
+
+    '''
+
+    def __init__(self, small, big, margin=None):
+        self.small = small
+        self.big = big
+        self.margin = config.CASCADE_MARGIN if margin is None else margin
+        self.load_time = small.load_time + big.load_time
+        self.warmup_time = small.warmup_time + big.warmup_time
+
+        self._lock = threading.Lock()
+        self._crops = 0
+        self._escalated = 0
+
+    def record(self, crops, escalated):
+
+        '''
+
+        Args:
+            - crops: (int) crops classified by the small model
+            - escalated: (int) crops of them also classified by the big model
+
+        '''
+
+        with self._lock:
+            self._crops += crops
+            self._escalated += escalated
+
+    def stats(self):
+
+        '''
+
+        Returns:
+            - (dict) crops classified, crops sent to the big model, and share of the crops
+              answered by the small model alone
+
+        '''
+
+        with self._lock:
+            skipped = self._crops - self._escalated
+            return {'crops': self._crops,
+                    'escalated': self._escalated,
+                    'skip_rate': skipped / self._crops if self._crops else None}
+
+
+session = None
+session_lock = threading.Lock()
+
+def get_session():
+
+    '''
+
+    Get the inference session of the outfit classification model. It is created once: the
+    next calls (or the calls waiting for the start-up warm-up to create it) get the same session
+
+    Returns:
+        - (InferenceSession) the shared session, a CascadeSession if config.CASCADE_SMALL_MODEL_PATH is set
+
+    '''
+
+    global session
+    with session_lock:
+        if session is None:
+            session = InferenceSession()
+            if config.CASCADE_SMALL_MODEL_PATH:
+                session = CascadeSession(InferenceSession(config.CASCADE_SMALL_MODEL_PATH), session)
+            print(f'Outfit model loaded in {session.load_time:.2f}s, warmed up in {session.warmup_time:.2f}s')
+        return session
@@ -14,7 +14,7 @@ Authors:
 jetbot_actions.py
 
 (1) speech_to_text:
-    - Recognize the user's speech and convert it to text
+    - Get the next command of the user, recognized in the background by speech_listener.py
 (2) get_date:
     - Get the current date and hour
 (3) greeting_context:
@@ -26,35 +26,124 @@ jetbot_actions.py
 (6) recommend_clothes:
     - Check if the user's outfit is suitable for the weather condition, temperature, and air quality
 (7) text_to_wav:
-    - Convert text to wav file
+    - Convert text to wav file (cached on disk by voice, language and text)
 (8) play:
     - Play the wav file
 (9) trigger_speech:
     - Respond to the user's command
+(10) get_tts_client / synthesize:
+    - Convert text to speech with a Google Cloud client shared by every reply
+(11) text_to_audio:
+    - Convert text to speech in memory (cached on disk by voice, language and text)
+(12) play_audio:
+    - Play the speech straight from memory on a persistent output device
+(13) get_clothe_model / warm_up_camera / warm_up_microphone / warm_up_person_detector:
+    - Load the outfit classification model, initiate the camera, calibrate the microphone and
+      create the person detector, on first use or by the start-up warm-up
+(14) synthesize_rest:
+    - Convert text to speech with the REST API of Google text-to-speech (config.GOOGLE_TTS_URL,
+      e.g. the stand-in server of benchmarks/api_standin.py)
+(15) camera_frames:
+    - Get the most recent frames of the J-Bot camera for the outfit classification
 
 '''
 
 ## Necessary Packages
-from google.cloud import texttospeech
+# The heavy subsystems are imported on first use (see startup.py), so J-Bot starts listening
+# before torch, jetbot and the Google Cloud client are loaded
+from startup import lazy_import
+import base64
 import json
 import datetime
 from datetime import datetime
 from datetime import date
 from datetime import time
-import playsound as ps
-import speech_recognition as sr
-from weather_callAPI import get_outside_condition
-from clothes_recognition import detectClothes
-import traitlets
-from IPython.display import display
-import ipywidgets.widgets as widgets
-from jetbot import Camera, bgr8_to_jpeg
-from torch import (cuda, device, load)
+import functools
+import threading
+import requests
+from call_policy import get_policy
+from tracing import traced
+from conditions_cache import get_cached_condition
+from tts_cache import (speech_key, tts_cache)
+from audio_player import audio_player
+from camera_service import camera_service
+from speech_listener import speech_listener
+import config
+texttospeech = lazy_import('google.cloud.texttospeech')
+ps = lazy_import('playsound')
+clothes_recognition = lazy_import('clothes_recognition')
+inference = lazy_import('inference')
+person_detectors = lazy_import('person_detectors')
+
+
+# Google text-to-speech client, instantiated on the first reply (see get_tts_client)
+tts_client = None
+tts_client_lock = threading.Lock()
+
+def get_clothe_model():
 
+    '''
+
+    Get the inference session of the outfit classification model (see inference.py). It is
+    loaded once: the next calls (or the calls waiting for the start-up warm-up to load it)
+    get the same session
+
+    Returns:
+        (inference.InferenceSession) the outfit classification model
+
+    '''
+
+    return inference.get_session()
+
+def warm_up_camera():
+
+    '''
+
+    Initiating the J-Bot camera for the first time is a slow process, hence the camera is
+    initiated while J-Bot starts up. It then keeps running and filling the ring buffer of
+    camera_service.py
+
+    '''
+
+    camera_service.start()
+
+def camera_frames():
+
+    '''
+
+    Get the frames of the J-Bot camera used to classify the outfit of the user: the
+    config.OUTFIT_VOTE_FRAMES most recent ones (see camera_service.py)
+
+    Returns:
+        (list) HxWx3 BGR frames, oldest first
+
+    '''
+
+    if config.OUTFIT_VOTE_FRAMES > 1:
+        return camera_service.recent(config.OUTFIT_VOTE_FRAMES, stride=config.OUTFIT_VOTE_STRIDE)
+    return [camera_service.latest()]
+
+def warm_up_person_detector():
+
+    '''
+
+    Create the person detector of config.PERSON_DETECTOR (see person_detectors.py) while J-Bot
+    starts up, so the local model is not downloaded and loaded on the first "how do I look"
+
+    '''
 
-# Loading the PyTorch model 
-device = device("cuda" if (cuda.is_available()) else "cpu")
-clothe_model = load('models/clothe_model.pkl').to(device)
+    person_detectors.get_detector()
+
+def warm_up_microphone():
+
+    '''
+
+    Calibrate the microphone to the ambient noise and start listening in the background
+    (see speech_listener.py), while J-Bot starts up
+
+    '''
+
+    speech_listener.start()
 
 def speech_to_text():
 
@@ -65,24 +154,18 @@ def speech_to_text():
 
     -----------------------------
 
-    Recognize the user's speech and convert it to text
+    Wait for the next command of the user. The microphone is kept open and the phrases are
+    recognized in the background (once each) by speech_listener.py, so this only takes the
+    next recognized text from its queue
 
     Returns:
         word: (str) the speech converted to text
 
     '''
 
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("Tell me something:")
-        audio = r.listen(source)
-        try:
-            word = r.recognize_google(audio)
-            print("You said:- " + r.recognize_google(audio))
-            return word
-        except sr.UnknownValueError:
-            print("Could not understand audio")
-        
+    print("Tell me something:")
+    return speech_listener.next_phrase()
+
 def get_date():
 
     '''
@@ -341,7 +424,33 @@ def recommend_clothes(highest_temperature, forecasted_weather, air_quality, top,
 
     return clothe_string + ' ' + raining_alert + ' ' + air_alert
 
-def text_to_wav(voice_name, text):
+def get_tts_client():
+
+    '''
+
+    Using Google Cloud Platform to handle the text-to-speech task
+        source: https://cloud.google.com/text-to-speech/docs/reference/libraries
+
+    You will need your own Google Cloud Platform authentication file (see config.GOOGLE_CREDENTIALS_FILE)
+
+    -----------------------------
+
+    Get the text-to-speech client. It is instantiated once, so the credentials and the channel
+    to Google are reused by every reply
+
+    Returns:
+        (texttospeech.TextToSpeechClient) the shared client
+
+    '''
+
+    global tts_client
+    with tts_client_lock:
+        if tts_client is None:
+            tts_client = texttospeech.TextToSpeechClient.from_service_account_json(config.GOOGLE_CREDENTIALS_FILE)
+        return tts_client
+
+@traced()
+def synthesize(voice_name, text):
 
     '''
 
@@ -349,26 +458,24 @@ def text_to_wav(voice_name, text):
         source 1: https://codelabs.developers.google.com/codelabs/cloud-text-speech-python3/index.html?index=..%2F..index#8
         source 2: https://cloud.google.com/text-to-speech/docs/reference/libraries
 
-    You will need your own Google Cloud Platform authentication file
-
     -----------------------------
 
-    Convert the text to wav file
+    Convert the text to speech (not cached)
 
     Args:
-        voice_name: (str) name for the wave file
+        voice_name: (str) name of the Google Cloud voice, e.g. 'en-US-Wavenet-F'
         text: (str) The text that is converted to speech
 
     Returns:
-        filename: (str) name of the wave file
+        (bytes) LINEAR16 wav audio
 
     '''
 
+    if config.GOOGLE_TTS_URL:
+        return get_policy('google_tts').call(functools.partial(synthesize_rest, voice_name, text),
+                                             key=(voice_name, text))
+
     language_code = '-'.join(voice_name.split('-')[:2])
-    output_name = f'output-{get_date()}'
-    
-    # Instantiates a client with your Google Cloud Platform authentication json file
-    client = texttospeech.TextToSpeechClient.from_service_account_json("<YOUR_AUTHENTICATION_FILE.json>")
 
     # Set the text input to be synthesized
     synthesis_input = texttospeech.SynthesisInput(text=text)
@@ -383,17 +490,96 @@ def text_to_wav(voice_name, text):
         audio_encoding=texttospeech.AudioEncoding.LINEAR16
     )
 
-    response = client.synthesize_speech(input=synthesis_input, voice=voice, audio_config=audio_config)
+    # Timeouts, retries and circuit breaker of the Google calls (see call_policy.py)
+    synthesize_speech = functools.partial(get_tts_client().synthesize_speech,
+                                          input=synthesis_input, voice=voice, audio_config=audio_config)
+    response = get_policy('google_tts').call(synthesize_speech, key=(voice_name, text))
+    return response.audio_content
 
-    filename = f'{output_name}.wav'
-    with open(filename, 'wb') as out:
-        out.write(response.audio_content)
-        print(f'Audio content written to "{filename}"')
-        
-    out.close()
+def synthesize_rest(voice_name, text, timeout=None):
+
+    '''
+
+    Convert the text to speech with the REST API of Google text-to-speech
+        https://cloud.google.com/text-to-speech/docs/reference/rest/v1/text/synthesize
+
+    Args:
+        voice_name: (str) name of the Google Cloud voice, e.g. 'en-US-Wavenet-F'
+        text: (str) The text that is converted to speech
+        timeout: (float) seconds to wait for the answer (see call_policy.py)
+
+    Returns:
+        (bytes) LINEAR16 wav audio
+
+    '''
+
+    language_code = '-'.join(voice_name.split('-')[:2])
+    body = {'input': {'text': text},
+            'voice': {'languageCode': language_code, 'name': voice_name},
+            'audioConfig': {'audioEncoding': 'LINEAR16'}}
+
+    response = requests.post(config.GOOGLE_TTS_URL + '/v1/text:synthesize', json=body, timeout=timeout)
+    response.raise_for_status()
+    return base64.b64decode(response.json()['audioContent'])
+
+@traced()
+def text_to_audio(voice_name, text):
+
+    '''
+
+    Convert the text to speech in memory. The audio is read from the TTS cache (see tts_cache.py)
+    when the sentence was already synthesized with the same voice, otherwise it is synthesized
+    and stored in the cache
+
+    Args:
+        voice_name: (str) name of the Google Cloud voice, e.g. 'en-US-Wavenet-F'
+        text: (str) The text that is converted to speech
+
+    Returns:
+        (bytes) LINEAR16 wav audio
+
+    '''
+
+    language_code = '-'.join(voice_name.split('-')[:2])
+    key = speech_key(voice_name, language_code, text)
+
+    audio_content = tts_cache.read(key)
+    if audio_content is None:
+        audio_content = synthesize(voice_name, text)
+        tts_cache.put(key, audio_content)
+    return audio_content
+
+@traced()
+def text_to_wav(voice_name, text):
+
+    '''
+
+    Convert the text to wav file. The wav files are stored in the TTS cache (see tts_cache.py),
+    so a sentence that was already synthesized with the same voice is not sent to Google again
+
+    Args:
+        voice_name: (str) name of the Google Cloud voice, e.g. 'en-US-Wavenet-F'
+        text: (str) The text that is converted to speech
+
+    Returns:
+        filename: (str) name of the wave file
+
+    '''
+
+    language_code = '-'.join(voice_name.split('-')[:2])
+
+    key = speech_key(voice_name, language_code, text)
+    filename = tts_cache.get(key)
+    if filename is not None:
+        print(f'Audio content read from cache "{filename}"')
+        return filename
+
+    filename = tts_cache.put(key, synthesize(voice_name, text))
+    print(f'Audio content written to "{filename}"')
     return filename
 
 
+@traced()
 def play(filename):
 
     '''
@@ -405,10 +591,31 @@ def play(filename):
 
     '''
 
-    ps.playsound(filename)
+    # J-Bot does not take her own reply for a command (see speech_listener.py)
+    with speech_listener.muted():
+        ps.playsound(filename)
+
+
+@traced()
+def play_audio(audio_content):
+
+    '''
+
+    Play wav audio (from text-to-speech) straight from memory, on the persistent output
+    device of audio_player.py
+
+    Args:
+        audio_content: (bytes) the wav audio
 
+    '''
 
-def trigger_speech(trigger_type):
+    # J-Bot does not take her own reply for a command (see speech_listener.py)
+    with speech_listener.muted():
+        audio_player.play(audio_content)
+
+
+@traced()
+def trigger_speech(trigger_type, images=None, clothe_model=None, location=None):
 
     '''
 
@@ -421,14 +628,18 @@ def trigger_speech(trigger_type):
 
     Args:
         trigger_type: (str) Command by the user
+        images: (list) for "camera", images of the user to use instead of the J-Bot camera
+                (e.g. uploaded to service.py)
+        clothe_model: for "camera", the outfit classification model, get_clothe_model() by default
+        location: (lat, lon) of the user when it is not J-Bot's (e.g. a client of service.py)
 
     Returns:
         (str) What J-Bot tells the user according to what the user asks
 
     '''
     
-    # Get the information about the weather and air quality
-    d = get_outside_condition()
+    # Get the information about the weather and air quality (answered from memory when possible)
+    d = get_cached_condition(location)
 
     temp = int(d['temperature'])
     highest_temp_forecast = 0
@@ -472,22 +683,18 @@ def trigger_speech(trigger_type):
     # Check the user's outfit and respond accordingly
     elif trigger_type == 'camera':
 
-        # Initiate the camera
-        camera = Camera.instance(width=224, height=224)
-        camera.start()
-        image = widgets.Image(format='jpeg', width=224, height=224)
-        camera_link = traitlets.dlink((camera, 'value'), (image, 'value'), transform=bgr8_to_jpeg)
-        image_path = 'temp.jpg'
+        clothe_model = clothe_model or get_clothe_model()
 
-        # Saving the camera image locally
-        with open(image_path, 'wb') as f:
-            f.write(image.value)
-        camera.stop()
+        # Take the most recent frames of the (already running) camera, as they are (BGR numpy arrays),
+        # unless the images are given, and classify the upper and lower outfits of the user
+        if images is None:
+            images = camera_frames()
 
-        # Classify the upper and lower outfits of the user
-        top, bot = detectClothes(image_path, clothe_model)
+        if len(images) > 1:
+            top, bot = clothes_recognition.detectClothesMultiFrame(images, clothe_model)
+        else:
+            top, bot = clothes_recognition.detectClothes(images[0], clothe_model)
         print(top, bot)
-        f.close()
 
         return recommend_clothes(highest_temp_forecast, forecasted_weather, air_quality, top, bot)
 
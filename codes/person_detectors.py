@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+person_detectors.py
+
+Every detector has a `detect(frame)` method returning the (x, y, w, h) box of the person
+in front of J-Bot, or (0, 0, 0, 0) if nobody is detected. The frame is a preprocessing.Frame
+(camera pixels, encoded to JPEG only for the remote detectors).
+`detect_batch(frames)` returns the boxes of several frames at once
+
+(1) AzureDetector:
+    - Detect the person with the Microsoft Azure Computer Vision API
+(2) TorchvisionDetector:
+    - Detect the person on the CPU (or GPU) of J-Bot with a small torchvision detector
+(3) get_detector:
+    - Get the detector selected in config.py (created once)
+(4) DetectorUnavailable:
+    - Raised when the selected detector cannot run on this J-Bot (e.g. torchvision too old)
+
+'''
+
+## Necessary Packages
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import config
+from call_policy import (get_policy, ServiceUnavailable)
+from inference import (device, inference_context)
+from startup import lazy_import
+torchvision = lazy_import('torchvision')
+
+# Label of the persons in the COCO dataset used to train the torchvision detectors
+COCO_PERSON = 1
+
+
+class DetectorUnavailable(ServiceUnavailable):
+
+    '''
+
+    The selected person detector cannot run on this J-Bot. Like a failed remote service,
+    the command is not answered and J-Bot keeps listening
+
+    '''
+
+
+class AzureDetector:
+
+    '''
+
+    J-Bot uses Microsoft Azure API to detect the user infront of the camera:
+        https://azure.microsoft.com/en-us/services/cognitive-services/computer-vision/
+
+    Please sign-up to Azure to get your own subscription key and endpoint url
+    (config.AZURE_SUBSCRIPTION_KEY and config.AZURE_ANALYZE_URL)
+    Please also follow the instruction from Microsoft webpage
+        https://docs.microsoft.com/en-us/azure/cognitive-services/Computer-vision/quickstarts/python-disk
+
+    '''
+
+    name = 'azure'
+
+    def __init__(self, subscription_key=None, analyze_url=None):
+        self.subscription_key = subscription_key or config.AZURE_SUBSCRIPTION_KEY
+        self.analyze_url = analyze_url or config.AZURE_ANALYZE_URL
+        # The frames of a batch are sent to Azure at the same time (see detect_batch)
+        self.pool = ThreadPoolExecutor(max_workers=config.AZURE_CONCURRENT_REQUESTS,
+                                       thread_name_prefix='azure-detect')
+
+    def detect(self, frame):
+
+        '''
+
+        Args:
+            - frame: (preprocessing.Frame) image generated by J-Bot camera
+        Returns:
+            - (x, y, w, h) box of the detected person, (0, 0, 0, 0) if nobody is detected
+
+        '''
+
+        # Timeouts, retries and circuit breaker of the Azure calls (see call_policy.py). There is
+        # no fallback: the box of a previous frame does not locate the user on this one
+        response = get_policy('azure').call(functools.partial(self.analyze, frame))
+
+        # If there are not response, or the API does not detect a person, return empty coordinates
+        if len(response) == 0:
+            return (0, 0, 0, 0)
+
+        if 'objects' not in response.keys():
+            return (0, 0, 0, 0)
+
+        person_detected = [d for d in response['objects'] if 'person' in d.values()]
+
+        if len(person_detected) == 0:
+            return (0, 0, 0, 0)
+
+        # Get the location of the person within the image
+        rectangle = person_detected[0]['rectangle']
+        return (rectangle['x'], rectangle['y'], rectangle['w'], rectangle['h'])
+
+    def analyze(self, frame, timeout=None):
+
+        '''
+
+        Args:
+            - frame: (preprocessing.Frame) image generated by J-Bot camera
+            - timeout: (float) seconds to wait for Azure
+        Returns:
+            - (dict) the analysis of the image by Azure
+
+        '''
+
+        headers = {'Ocp-Apim-Subscription-Key': self.subscription_key,
+                'Content-Type': 'application/octet-stream'}
+        params = {'visualFeatures': 'Categories,Description,Objects'}
+
+        # The only place where the frame is encoded
+        response = requests.post(
+          self.analyze_url, headers=headers, params=params, data=frame.jpeg(), timeout=timeout)
+
+        response.raise_for_status()
+        return response.json()
+
+    def detect_batch(self, frames):
+
+        '''
+
+        Args:
+            - frames: (list) preprocessing.Frame images
+        Returns:
+            - (list) one (x, y, w, h) box per frame (one API call per frame, sent concurrently,
+              so the batch takes about as long as its slowest call)
+
+        '''
+
+        if len(frames) == 1:
+            return [self.detect(frames[0])]
+        return list(self.pool.map(self.detect, frames))
+
+
+class TorchvisionDetector:
+
+    '''
+
+    Local person detector, using a torchvision model pretrained on COCO
+        https://pytorch.org/vision/stable/models.html#object-detection
+
+    The default 'fasterrcnn_mobilenet_v3_large_320_fpn' runs at the low resolution of the
+    J-Bot camera (224x224) in a fraction of the Azure round trip. It needs torchvision >= 0.8,
+    the weights are downloaded on first use
+
+    Args:
+        - model_name: (str) name of the detection model in torchvision.models.detection
+        - score_threshold: (float) minimum confidence of a person detection
+
+    '''
+
+    name = 'local'
+
+    def __init__(self, model_name=None, score_threshold=None):
+        self.model_name = model_name or config.LOCAL_DETECTOR_MODEL
+        self.score_threshold = score_threshold if score_threshold is not None else config.LOCAL_DETECTOR_SCORE
+        try:
+            constructor = getattr(torchvision.models.detection, self.model_name, None)
+        except ImportError as e:
+            raise DetectorUnavailable(f"The 'local' person detector needs torchvision: {e}") from e
+        if constructor is None:
+            raise DetectorUnavailable(f'torchvision {torchvision.__version__} has no {self.model_name} '
+                                      f"(it needs torchvision >= 0.8), set PERSON_DETECTOR = 'azure' in config.py")
+        try:
+            model = constructor(weights='DEFAULT')
+        except TypeError:
+            # torchvision < 0.13
+            model = constructor(pretrained=True)
+        self.model = model.eval().to(device)
+
+    def detect(self, frame):
+
+        '''
+
+        Args:
+            - frame: (preprocessing.Frame) image generated by J-Bot camera
+        Returns:
+            - (x, y, w, h) box of the most confident person, (0, 0, 0, 0) if nobody is detected
+
+        '''
+
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+
+        '''
+
+        Args:
+            - frames: (list) preprocessing.Frame images
+        Returns:
+            - (list) one (x, y, w, h) box per frame, from a single forward pass
+
+        '''
+
+        with inference_context():
+            outputs = self.model([frame.tensor(device) for frame in frames])
+        return [self.person_box(output) for output in outputs]
+
+    def person_box(self, output):
+        # The detections are sorted by decreasing score
+        for box, label, score in zip(output['boxes'], output['labels'], output['scores']):
+            if label.item() == COCO_PERSON and score.item() >= self.score_threshold:
+                x1, y1, x2, y2 = [int(round(v)) for v in box.tolist()]
+                return (x1, y1, x2 - x1, y2 - y1)
+        return (0, 0, 0, 0)
+
+
+DETECTORS = {AzureDetector.name: AzureDetector,
+             TorchvisionDetector.name: TorchvisionDetector}
+
+detectors = {}
+detectors_lock = threading.Lock()
+
+def get_detector(name=None):
+
+    '''
+
+    Get a person detector. Each detector is created once (the local one loads a model)
+
+    Args:
+        - name: (str) 'local' or 'azure', config.PERSON_DETECTOR by default
+    Returns:
+        - the detector
+
+    '''
+
+    name = name or config.PERSON_DETECTOR
+    if name not in DETECTORS:
+        raise ValueError(f'Unknown person detector {name!r}, expected one of {sorted(DETECTORS)}')
+
+    with detectors_lock:
+        if name not in detectors:
+            detectors[name] = DETECTORS[name]()
+        return detectors[name]
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+preprocessing.py
+
+(1) CropPreprocessor:
+    - Turn the crops of a camera frame into the normalized batch expected by the outfit
+      model, in a few tensor operations
+(2) Frame:
+    - Image handed from the camera to the detectors and the outfit model without copies,
+      encoded to JPEG only if a remote detector needs it
+(3) as_frame:
+    - Wrap a camera frame, an image path or a Frame as a Frame
+
+'''
+
+## Necessary Packages
+import io
+import numpy as np
+from PIL import Image
+import torch
+from torchvision.ops import roi_align
+
+# ITU-R 601-2 luma weights, as used by PIL (and transforms.Grayscale)
+LUMA_RGB = [0.299, 0.587, 0.114]
+
+
+class CropPreprocessor:
+
+    '''
+
+    Equivalent of the per-crop transforms used to train the model
+        ToPILImage -> Resize((size, size)) -> Grayscale(3) -> ToTensor -> Normalize(0.5, 0.5)
+    for every crop of a frame at once, without PIL:
+        1. the frame is converted to grayscale once
+        2. every box is resized to size x size by a single roi_align (bilinear, averaging
+           several samples per output pixel when shrinking, like the PIL antialiasing)
+        3. the batch is normalized to [-1, 1] and the gray channel is replicated (no copy)
+
+    Built once, when the module is loaded
+
+    Args:
+        - size: (int) side of the model input (100 for our model)
+        - device: (torch.device) device of the batch
+
+    '''
+
+    def __init__(self, size=100, device=None):
+        self.size = size
+        self.device = device or torch.device('cpu')
+        luma = torch.tensor(LUMA_RGB, device=self.device).view(1, 3, 1, 1)
+        self.luma = {'RGB': luma, 'BGR': luma.flip(1)}
+
+    def __call__(self, frame, boxes, channel_order='RGB'):
+
+        '''
+
+        Args:
+            - frame: (numpy.ndarray) HxWx3 uint8 image
+            - boxes: (list) N (x1, y1, x2, y2) boxes in pixels
+            - channel_order: (str) 'RGB' (PIL images) or 'BGR' (J-Bot camera frames)
+        Returns:
+            - (torch.Tensor) Nx3xSxS normalized batch
+
+        '''
+
+        return self.batch([frame], [(0, x1, y1, x2, y2) for x1, y1, x2, y2 in boxes], channel_order)
+
+    def batch(self, frames, boxes, channel_order='RGB'):
+
+        '''
+
+        Crops of several frames of the same size (e.g. the recent frames of the camera) at once
+
+        Args:
+            - frames: (list) F HxWx3 uint8 images
+            - boxes: (list) N (frame index, x1, y1, x2, y2) boxes in pixels
+            - channel_order: (str) 'RGB' (PIL images) or 'BGR' (J-Bot camera frames)
+        Returns:
+            - (torch.Tensor) Nx3xSxS normalized batch, in the order of the boxes
+
+        '''
+
+        img = torch.from_numpy(np.stack(frames)).to(self.device)
+        img = img.permute(0, 3, 1, 2).float()
+
+        # Fx1xHxW grayscale frames
+        gray = (img * self.luma[channel_order]).sum(dim=1, keepdim=True)
+
+        # roi_align expects (frame index, x1, y1, x2, y2) rows
+        rois = torch.tensor(boxes, dtype=gray.dtype, device=self.device)
+        crops = roi_align(gray, rois, output_size=(self.size, self.size),
+                          spatial_scale=1.0, sampling_ratio=-1, aligned=True)
+
+        # (x / 255 - 0.5) / 0.5
+        crops = crops.mul_(2.0 / 255.0).sub_(1.0)
+        return crops.expand(-1, 3, -1, -1)
+
+
+class Frame:
+
+    '''
+
+    Image analyzed by detectClothes. The pixels of the camera are used as they are (no copy,
+    no encoding): the JPEG bytes are only produced, once, when a remote detector asks for them
+
+    Args:
+        - array: (numpy.ndarray) HxWx3 uint8 image
+        - channel_order: (str) 'BGR' (J-Bot camera frames) or 'RGB' (PIL images)
+        - path: (str) file the image was read from, if any (its bytes are sent as they are)
+
+    '''
+
+    def __init__(self, array, channel_order='BGR', path=None):
+        self.array = array
+        self.channel_order = channel_order
+        self.path = path
+        self._jpeg = None
+
+    @classmethod
+    def from_path(cls, path):
+
+        '''
+
+        Args:
+            - path: (str) path of an image file
+        Returns:
+            - (Frame) the decoded RGB image
+
+        '''
+
+        return cls(np.array(Image.open(path).convert('RGB')), 'RGB', path)
+
+    @classmethod
+    def from_bytes(cls, data):
+
+        '''
+
+        Args:
+            - data: (bytes) encoded image, e.g. uploaded to service.py
+        Returns:
+            - (Frame) the decoded RGB image (a JPEG upload is sent as it is to the remote detectors)
+
+        '''
+
+        image = Image.open(io.BytesIO(data))
+        frame = cls(np.array(image.convert('RGB')), 'RGB')
+        if image.format == 'JPEG':
+            frame._jpeg = data
+        return frame
+
+    def rgb(self):
+
+        '''
+
+        Returns:
+            - (numpy.ndarray) HxWx3 RGB view of the image (no copy)
+
+        '''
+
+        return self.array if self.channel_order == 'RGB' else self.array[..., ::-1]
+
+    def tensor(self, device=None):
+
+        '''
+
+        Args:
+            - device: (torch.device) device of the tensor
+        Returns:
+            - (torch.Tensor) 3xHxW RGB float image in [0, 1], as transforms.ToTensor
+
+        '''
+
+        img = torch.from_numpy(np.ascontiguousarray(self.array)).to(device).permute(2, 0, 1)
+        if self.channel_order == 'BGR':
+            img = img.flip(0)
+        return img.float().div_(255.0)
+
+    def jpeg(self):
+
+        '''
+
+        Returns:
+            - (bytes) the image encoded as JPEG (the original file if it was read from one)
+
+        '''
+
+        if self._jpeg is None:
+            if self.path is not None:
+                with open(self.path, 'rb') as f:
+                    self._jpeg = f.read()
+            else:
+                buffer = io.BytesIO()
+                Image.fromarray(np.ascontiguousarray(self.rgb())).save(buffer, format='JPEG', quality=90)
+                self._jpeg = buffer.getvalue()
+        return self._jpeg
+
+def as_frame(image, channel_order='BGR'):
+
+    '''
+
+    Args:
+        - image: a Frame, a HxWx3 uint8 numpy.ndarray (e.g. camera.value) or the path of an image
+        - channel_order: (str) channel order of a numpy.ndarray image, 'BGR' for the J-Bot camera
+    Returns:
+        - (Frame) the image
+
+    '''
+
+    if isinstance(image, Frame):
+        return image
+    if isinstance(image, np.ndarray):
+        return Frame(image, channel_order)
+    return Frame.from_path(image)
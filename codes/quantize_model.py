@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+quantize_model.py
+
+Make an int8 version of the outfit classification model, for the CPU of the Jetson Nano
+
+    python3 codes/quantize_model.py --mode static --max-drop 0.03
+
+The int8 model is exported (TorchScript, with a metadata json file next to it) only if its
+accuracy on dataset/test is at most --max-drop below the 0.81 of model_evaluation.ipynb.
+Set CLOTHE_MODEL_PATH = 'models/clothe_model_int8.pt' in config.py to use it
+
+(1) quantizable_model:
+    - Copy the weights of the fp32 ResNet50 into the quantizable ResNet50 of torchvision
+(2) quantize_static:
+    - Quantize the weights and the activations, calibrated on images of dataset/train
+(3) quantize_dynamic:
+    - Quantize the weights of the fully connected layer only (no calibration)
+(4) export:
+    - Save the int8 model and its metadata, loaded by inference.load_model
+
+'''
+
+## Necessary Packages
+import argparse
+import json
+import os
+import sys
+import time
+import torch
+import torchvision
+import config
+from clothes_recognition import CLASSES
+from evaluation import (BASELINE_ACCURACY, load_dataset, evaluate)
+from inference import (inference_context, metadata_path)
+
+def quantizable_model(model):
+
+    '''
+
+    Args:
+        - model: (torch.nn.Module) the fp32 ResNet50 of model_evaluation.ipynb
+    Returns:
+        - (torch.nn.Module) the same weights in torchvision's quantizable ResNet50, with
+          Conv + BatchNorm + ReLU fused
+
+    '''
+
+    qmodel = torchvision.models.quantization.resnet50(quantize=False, num_classes=len(CLASSES))
+    qmodel.load_state_dict(model.state_dict())
+    qmodel.eval()
+    qmodel.fuse_model()
+    return qmodel
+
+def quantize_static(model, calibration_loader, batches, engine):
+
+    '''
+
+    Args:
+        - model: (torch.nn.Module) the fp32 model
+        - calibration_loader: (torch.utils.data.DataLoader) images to observe the activations
+        - batches: (int) number of calibration batches
+        - engine: (str) 'qnnpack' (ARM) or 'fbgemm' (x86)
+    Returns:
+        - (torch.nn.Module) the int8 model
+
+    '''
+
+    qmodel = quantizable_model(model.cpu())
+    qmodel.qconfig = torch.quantization.get_default_qconfig(engine)
+    torch.quantization.prepare(qmodel, inplace=True)
+
+    with inference_context():
+        for i, (inputs, _) in enumerate(calibration_loader):
+            if i >= batches:
+                break
+            qmodel(inputs)
+
+    return torch.quantization.convert(qmodel, inplace=True)
+
+def quantize_dynamic(model):
+
+    '''
+
+    Args:
+        - model: (torch.nn.Module) the fp32 model
+    Returns:
+        - (torch.nn.Module) the model with an int8 fully connected layer (the convolutions stay fp32)
+
+    '''
+
+    return torch.quantization.quantize_dynamic(model.cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+def export(qmodel, path, metadata, input_shape=(2, 3, 100, 100)):
+
+    '''
+
+    Args:
+        - qmodel: (torch.nn.Module) the int8 model
+        - path: (str) e.g. 'models/clothe_model_int8.pt'
+        - metadata: (dict) written to the json file next to the model
+        - input_shape: (tuple) shape of the batch used to trace the model
+
+    '''
+
+    with inference_context():
+        scripted = torch.jit.trace(qmodel, torch.zeros(input_shape))
+    scripted.save(path)
+    with open(metadata_path(path), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize the outfit classification model to int8')
+    parser.add_argument('--model', default='models/clothe_model.pkl', help='fp32 pickled model')
+    parser.add_argument('--output', default='models/clothe_model_int8.pt')
+    parser.add_argument('--mode', choices=['static', 'dynamic'], default='static')
+    parser.add_argument('--engine', choices=['qnnpack', 'fbgemm'], default=config.QUANTIZED_ENGINE)
+    parser.add_argument('--train', default='dataset/train', help='calibration images (static mode)')
+    parser.add_argument('--test', default='dataset/test', help='images of the accuracy check')
+    parser.add_argument('--calibration-batches', type=int, default=10)
+    parser.add_argument('--baseline', type=float, default=BASELINE_ACCURACY)
+    parser.add_argument('--max-drop', type=float, default=0.03, help='largest accepted accuracy drop')
+    args = parser.parse_args()
+
+    if args.engine not in torch.backends.quantized.supported_engines:
+        raise SystemExit(f'The {args.engine} engine is not supported by this torch build '
+                         f'({torch.backends.quantized.supported_engines})')
+    torch.backends.quantized.engine = args.engine
+
+    model = torch.load(args.model, map_location='cpu').eval()
+    test_loader = load_dataset(args.test)
+    fp32_accuracy, fp32_latency = evaluate(model, test_loader)
+
+    since = time.perf_counter()
+    if args.mode == 'static':
+        calibration_loader = load_dataset(args.train, shuffle=True)
+        qmodel = quantize_static(model, calibration_loader, args.calibration_batches, args.engine)
+    else:
+        qmodel = quantize_dynamic(model)
+    print(f'Quantized ({args.mode}, {args.engine}) in {time.perf_counter() - since:.1f}s')
+
+    int8_accuracy, int8_latency = evaluate(qmodel, test_loader)
+    drop = args.baseline - int8_accuracy
+
+    print(f'{"model":<6}{"accuracy":>10}{"ms/batch":>10}')
+    print(f'{"fp32":<6}{fp32_accuracy:>10.3f}{1000 * fp32_latency:>10.1f}')
+    print(f'{"int8":<6}{int8_accuracy:>10.3f}{1000 * int8_latency:>10.1f}')
+    print(f'Accuracy drop from the {args.baseline:.2f} baseline: {drop:.3f} (max {args.max_drop:.3f})')
+
+    if drop > args.max_drop:
+        print(f'Not exported: the int8 model loses more than {args.max_drop:.3f} accuracy', file=sys.stderr)
+        sys.exit(1)
+
+    export(qmodel, args.output, {
+        'quantized': True,
+        'mode': args.mode,
+        'engine': args.engine,
+        'source': os.path.basename(args.model),
+        'accuracy': round(int8_accuracy, 4),
+        'fp32_accuracy': round(fp32_accuracy, 4),
+        'baseline': args.baseline,
+    })
+    print(f'Exported to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+speaker.py
+
+(1) split_sentences:
+    - Split a response of J-Bot into sentences
+(2) speak:
+    - Say a response sentence by sentence: the first sentence is played as soon as it is
+      synthesized while the next ones are synthesized in the background
+
+'''
+
+## Necessary Packages
+import re
+from concurrent.futures import ThreadPoolExecutor
+import config
+from jetbot_actions import (text_to_audio, play_audio)
+
+# Workers synthesizing the sentences ahead of the playback
+synthesis_pool = ThreadPoolExecutor(max_workers=config.SPEAKER_SYNTHESIS_WORKERS,
+                                    thread_name_prefix='speaker-synthesis')
+
+def split_sentences(text):
+
+    '''
+
+    Split a response into sentences, e.g.
+        "Good Morning. Today is 20 degrees.. It might be raining at 3 PM."
+        -> ['Good Morning.', 'Today is 20 degrees..', 'It might be raining at 3 PM.']
+
+    Args:
+        text: (str) the response of J-Bot
+
+    Returns:
+        (list) the sentences, without the empty or punctuation-only pieces
+
+    '''
+
+    pieces = re.split(r'(?<=[.!?])\s+', text.strip())
+    return [p for p in pieces if re.search(r'\w', p)]
+
+def speak(voice_name, text):
+
+    '''
+
+    Say a response, blocking until it has been played.
+    Every sentence is submitted for synthesis at once and played in order, so the user starts
+    hearing J-Bot after the first (short) sentence is synthesized, not the whole paragraph.
+    The sentences are synthesized and cached one by one (see text_to_audio), so repeated
+    sentences are reused even inside different responses
+
+    Args:
+        voice_name: (str) name of the Google Cloud voice, e.g. 'en-US-Wavenet-F'
+        text: (str) the response of J-Bot
+
+    '''
+
+    sentences = split_sentences(text)
+    futures = [synthesis_pool.submit(text_to_audio, voice_name, s) for s in sentences]
+    try:
+        for future in futures:
+            play_audio(future.result())
+    finally:
+        # If a sentence could not be synthesized or played, do not synthesize the rest for nothing
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+speech_listener.py
+
+(1) SpeechListener:
+    - Keep the microphone open and listen to the user on a background thread. The ambient
+      noise is calibrated once, every phrase is recognized once, and the recognized
+      commands wait in a queue until the main loop takes them
+
+'''
+
+## Necessary Packages
+import contextlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from startup import lazy_import
+from tracing import span
+sr = lazy_import('speech_recognition')
+
+
+class SpeechListener:
+
+    '''
+
+    Persistent speech front end, using the speech_recognition library from Python
+        source: https://github.com/Uberi/speech_recognition/blob/master/examples/background_listening.py
+
+    The Recognizer and the Microphone are created once. listen_in_background captures the
+    phrases, and a single recognition thread sends each of them to Google speech recognition
+    (so the capture of the next phrase does not wait for it). The phrases heard while J-Bot
+    plays a reply (see muted) are dropped, so she does not listen to herself, but the user
+    may give the next command while she fetches the answer of the previous one.
+
+    Args:
+        - queue_size: (int) recognized commands kept until the main loop takes them, the oldest
+          ones are dropped first. config.SPEECH_QUEUE_SIZE by default
+
+    '''
+
+    def __init__(self, queue_size=None):
+        self.recognizer = None
+        self.phrases = queue.Queue(maxsize=queue_size or config.SPEECH_QUEUE_SIZE)
+
+        self._lock = threading.Lock()
+        self._stop_listening = None
+        self._recognition_pool = None
+        self._muted = 0
+        self._unmuted_at = 0.0
+
+        self.captured = 0
+        self.recognized = 0
+        self.not_understood = 0
+        self.unavailable = 0
+        self.dropped = 0
+
+    def start(self):
+
+        '''
+
+        Calibrate the microphone to the ambient noise and start listening in the background.
+        Calling it again does nothing
+
+        '''
+
+        with self._lock:
+            if self._stop_listening is not None:
+                return
+            recognizer = sr.Recognizer()
+            recognizer.operation_timeout = config.SPEECH_RECOGNITION_TIMEOUT
+            microphone = sr.Microphone()
+            with microphone as source:
+                print('Calibrating the microphone, please stay quiet...')
+                recognizer.adjust_for_ambient_noise(source, duration=config.SPEECH_CALIBRATION_SECONDS)
+
+            self.recognizer = recognizer
+            self._recognition_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speech-recognition')
+            self._stop_listening = recognizer.listen_in_background(
+                microphone, self._on_phrase, phrase_time_limit=config.SPEECH_PHRASE_TIME_LIMIT)
+
+    def stop(self):
+
+        '''
+
+        Stop listening and release the microphone
+
+        '''
+
+        with self._lock:
+            stop_listening, self._stop_listening = self._stop_listening, None
+            recognition_pool, self._recognition_pool = self._recognition_pool, None
+        # Outside of the lock: the listening and recognition threads may be waiting for it
+        if stop_listening is not None:
+            stop_listening(wait_for_stop=True)
+            recognition_pool.shutdown(wait=True)
+
+    def next_phrase(self, timeout=None):
+
+        '''
+
+        Wait for the next recognized command of the user
+
+        Args:
+            - timeout: (float) seconds to wait, None to wait until the user speaks
+        Returns:
+            - (str) the recognized text, None after the timeout
+
+        '''
+
+        self.start()
+        try:
+            return self.phrases.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    @contextlib.contextmanager
+    def muted(self):
+
+        '''
+
+        Drop the phrases heard inside the block (while J-Bot plays a reply), including the
+        ones that started inside it and ended after it
+
+        '''
+
+        with self._lock:
+            self._muted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._muted -= 1
+                self._unmuted_at = time.monotonic()
+
+    def stats(self):
+
+        '''
+
+        Returns:
+            - (dict) counters of the phrases
+
+        '''
+
+        with self._lock:
+            return {'captured': self.captured, 'recognized': self.recognized,
+                    'not_understood': self.not_understood, 'unavailable': self.unavailable,
+                    'dropped': self.dropped,
+                    'waiting': self.phrases.qsize()}
+
+    def _on_phrase(self, recognizer, audio):
+        # Called by the listening thread of speech_recognition once a phrase is captured
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        started_at = time.monotonic() - duration
+        with self._lock:
+            self.captured += 1
+            if self._muted or started_at < self._unmuted_at or self._recognition_pool is None:
+                self.dropped += 1
+                return
+            self._recognition_pool.submit(self._recognize, audio)
+
+    def _recognize(self, audio):
+        # Each captured phrase is recognized exactly once
+        with span('speech_to_text'):
+            try:
+                text = self.recognizer.recognize_google(audio, language=config.SPEECH_LANGUAGE)
+            except sr.UnknownValueError:
+                print('Could not understand audio')
+                with self._lock:
+                    self.not_understood += 1
+                return
+            except sr.RequestError as e:
+                print(f'Speech recognition unavailable: {e}')
+                with self._lock:
+                    self.unavailable += 1
+                return
+
+        print('You said:- ' + text)
+        with self._lock:
+            self.recognized += 1
+            # The main loop is busy: the oldest command is the least relevant one
+            while True:
+                try:
+                    self.phrases.put_nowait(text)
+                    break
+                except queue.Full:
+                    try:
+                        self.phrases.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+
+speech_listener = SpeechListener()
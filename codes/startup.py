@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+startup.py
+
+(1) lazy_import:
+    - Import a heavy module (torch, jetbot, google.cloud...) on first use instead of at start-up
+(2) mark:
+    - Record the time elapsed since J-Bot started for a start-up milestone
+(3) warm_up:
+    - Run the slow start-up tasks (model loading, camera...) in the background, or before
+      listening in the eager mode
+(4) report:
+    - Print the import-time and ready-time numbers of the start-up
+
+'''
+
+## Necessary Packages
+import importlib
+import threading
+import time
+import types
+
+# Reference time of the start-up (this module is the first one imported by main.py)
+started_at = time.perf_counter()
+
+# Seconds spent importing each lazy module, and seconds since start-up of each milestone
+import_times = {}
+ready_times = {}
+timings_lock = threading.Lock()
+
+# Set once every warm-up task finished
+warmed_up = threading.Event()
+
+
+class LazyModule(types.ModuleType):
+
+    '''
+
+    Stand-in for a module that is only imported when one of its attributes is used
+
+    Args:
+        - name: (str) full name of the module, e.g. 'google.cloud.texttospeech'
+
+    '''
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self):
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                since = time.perf_counter()
+                self._lazy_module = importlib.import_module(self.__name__)
+                with timings_lock:
+                    import_times[self.__name__] = time.perf_counter() - since
+            return self._lazy_module
+
+    def __getattr__(self, attr):
+        # Only called for the attributes that are not found on the stand-in itself
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name):
+
+    '''
+
+    Import a module on first use
+
+    Args:
+        - name: (str) full name of the module, e.g. 'google.cloud.texttospeech'
+    Returns:
+        - (LazyModule) stand-in that imports the module when one of its attributes is used
+
+    '''
+
+    return LazyModule(name)
+
+def mark(milestone):
+
+    '''
+
+    Record the time elapsed since start-up for a milestone, e.g. 'listening'
+
+    Args:
+        - milestone: (str) name of the milestone
+    Returns:
+        - (float) seconds since start-up
+
+    '''
+
+    elapsed = time.perf_counter() - started_at
+    with timings_lock:
+        ready_times[milestone] = elapsed
+    return elapsed
+
+def run_warm_up(tasks):
+    for name, task in tasks:
+        since = time.perf_counter()
+        try:
+            task()
+        except Exception as e:
+            print(f'Warm-up of {name} failed, it will be retried on first use: {e}')
+            continue
+        mark(f'{name} ready')
+        print(f'Warm-up of {name} took {time.perf_counter() - since:.2f}s')
+    mark('warmed up')
+    warmed_up.set()
+    report()
+
+def warm_up(tasks, background=True):
+
+    '''
+
+    Run the slow start-up tasks. A failed task is only reported: the subsystem is loaded again
+    on first use
+
+    Args:
+        - tasks: (list) (name, function) pairs, run in order
+        - background: (bool) run them on a background thread while J-Bot already listens.
+          Otherwise they are run before returning (eager start-up)
+    Returns:
+        - (threading.Thread) the warm-up thread, None if they were run in the foreground
+
+    '''
+
+    if not background:
+        run_warm_up(tasks)
+        return None
+
+    thread = threading.Thread(target=run_warm_up, args=(tasks,), name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def report():
+
+    '''
+
+    Print the start-up numbers: the import time of each lazy module and the time since
+    start-up of each milestone
+
+    Returns:
+        - (dict) 'imports' and 'ready' timings in seconds
+
+    '''
+
+    with timings_lock:
+        imports = dict(import_times)
+        ready = dict(ready_times)
+
+    print('Start-up report')
+    for name, seconds in sorted(imports.items(), key=lambda item: -item[1]):
+        print(f'    import {name}: {seconds:.2f}s')
+    for milestone, seconds in sorted(ready.items(), key=lambda item: item[1]):
+        print(f'    {milestone}: {seconds:.2f}s after start-up')
+
+    return {'imports': imports, 'ready': ready}
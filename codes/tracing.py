@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+tracing.py
+
+Where do the seconds of a command go? Every stage of a command (speech_to_text,
+get_outside_condition, detectPerson, inference, text_to_wav, play...) is a span:
+    - its duration is added to the in-process histogram of the stage (see report)
+    - it is written to a rolling trace file in the Chrome trace event format, which can be
+      opened in chrome://tracing or https://ui.perfetto.dev
+
+(1) Histogram:
+    - Latency histogram with fixed logarithmic buckets (constant memory)
+(2) TraceWriter:
+    - Write the spans to a rolling trace file on a background thread
+(3) span / traced:
+    - Measure a block of code / a function as a stage
+(4) stage_stats / report / flush:
+    - Get or print the latency of every stage, and write the pending spans
+
+'''
+
+## Necessary Packages
+import bisect
+import functools
+import json
+import math
+import os
+import queue
+import threading
+import time
+import config
+
+
+class Histogram:
+
+    '''
+
+    Latency histogram. The buckets grow by 2^(1/4) (about 19%) from 1 ms to 100 s, so the
+    percentiles are within one bucket of the exact value
+
+    '''
+
+    BOUNDS = [0.001 * 2 ** (i / 4) for i in range(67)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+
+        '''
+
+        Args:
+            - seconds: (float) duration of a span
+
+        '''
+
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+
+        '''
+
+        Args:
+            - q: (float) percentile between 0 and 100
+        Returns:
+            - (float) upper bound of the bucket holding the percentile, in seconds
+
+        '''
+
+        rank = max(1, math.ceil(q / 100 * self.count))
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+
+        '''
+
+        Returns:
+            - (dict) count, mean, p50, p95, p99 and max, in seconds
+
+        '''
+
+        if self.count == 0:
+            return {'count': 0}
+        return {'count': self.count, 'mean': self.total / self.count, 'p50': self.percentile(50),
+                'p95': self.percentile(95), 'p99': self.percentile(99), 'max': self.max}
+
+
+class TraceWriter:
+
+    '''
+
+    Rolling trace file in the Chrome trace event format (JSON array, the closing bracket is
+    optional). The spans are queued and written by a background thread, so the stages do not
+    wait for the disk. Once the file exceeds `max_bytes`, it is renamed to <path>.1 (the
+    previous ones to <path>.2 ... <path>.<backups>) and a new file is started
+
+    Args:
+        - path: (str) trace file, config.TRACE_FILE by default
+        - max_bytes: (int) config.TRACE_MAX_BYTES by default
+        - backups: (int) number of previous files kept, config.TRACE_BACKUPS by default
+
+    '''
+
+    def __init__(self, path=None, max_bytes=None, backups=None):
+        self.path = path or config.TRACE_FILE
+        self.max_bytes = max_bytes or config.TRACE_MAX_BYTES
+        self.backups = config.TRACE_BACKUPS if backups is None else backups
+
+        self._queue = queue.Queue()
+        self._file = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, event):
+
+        '''
+
+        Args:
+            - event: (dict) Chrome trace event
+
+        '''
+
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+                    self._thread.start()
+        self._queue.put(event)
+
+    def flush(self):
+
+        '''
+
+        Wait until the queued spans are written
+
+        '''
+
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                self._write(event)
+            except OSError as e:
+                print(f'Could not write the trace: {e}')
+            finally:
+                self._queue.task_done()
+
+    def _write(self, event):
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps(event) + ',\n')
+        if self._queue.empty():
+            self._file.flush()
+        if self._file.tell() > self.max_bytes:
+            self._rotate()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a')
+        if self._file.tell() == 0:
+            self._file.write('[\n')
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{index}'):
+                os.replace(f'{self.path}.{index}', f'{self.path}.{index + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+
+histograms = {}
+histograms_lock = threading.Lock()
+writer = TraceWriter()
+pid = os.getpid()
+
+
+class Span:
+
+    '''
+
+    Context manager measuring a stage (see span)
+
+    '''
+
+    __slots__ = ('name', 'args', 'start', 'started_at')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        duration = time.perf_counter() - self.start
+        with histograms_lock:
+            if self.name not in histograms:
+                histograms[self.name] = Histogram()
+            histograms[self.name].add(duration)
+
+        event = {'name': self.name, 'cat': 'jbot', 'ph': 'X', 'pid': pid,
+                 'tid': threading.get_ident(), 'ts': int(self.started_at * 1e6),
+                 'dur': int(duration * 1e6)}
+        if error_type is not None:
+            self.args['error'] = error_type.__name__
+        if self.args:
+            event['args'] = self.args
+        writer.write(event)
+        return False
+
+
+class NullSpan:
+
+    '''
+
+    Span doing nothing, when config.TRACING_ENABLED is False
+
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        return False
+
+
+null_span = NullSpan()
+
+def span(name, **args):
+
+    '''
+
+    Measure a stage of a command
+
+        with tracing.span('detectPerson', detector='local'):
+            ...
+
+    Args:
+        - name: (str) name of the stage
+        - args: details stored with the span in the trace file
+    Returns:
+        - the context manager of the span
+
+    '''
+
+    if not config.TRACING_ENABLED:
+        return null_span
+    return Span(name, args)
+
+def traced(name=None):
+
+    '''
+
+    Decorator measuring every call of a function as a stage
+
+    Args:
+        - name: (str) name of the stage, the name of the function by default
+    Returns:
+        - the decorator
+
+    '''
+
+    def decorator(function):
+        stage = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def stage_stats():
+
+    '''
+
+    Returns:
+        - (dict) stage -> Histogram.snapshot (seconds)
+
+    '''
+
+    with histograms_lock:
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+def report():
+
+    '''
+
+    Print the latency of every stage since start-up
+
+    Returns:
+        - (dict) see stage_stats
+
+    '''
+
+    stats = stage_stats()
+    print('Stage latencies (ms)')
+    print(f'    {"stage":<24}{"count":>7}{"mean":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}')
+    # The stages taking the most time in total first
+    for name, s in sorted(stats.items(), key=lambda item: -item[1]['count'] * item[1]['mean']):
+        print(f'    {name:<24}{s["count"]:>7}{1000 * s["mean"]:>9.1f}{1000 * s["p50"]:>9.1f}'
+              f'{1000 * s["p95"]:>9.1f}{1000 * s["p99"]:>9.1f}{1000 * s["max"]:>9.1f}')
+    return stats
+
+def flush():
+
+    '''
+
+    Write the pending spans to the trace file
+
+    '''
+
+    writer.flush()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+train_small_model.py
+
+Train the small outfit classification model answering first in the cascade (see
+config.CASCADE_SMALL_MODEL_PATH), on the same dataset and with the same recipe as the ResNet50
+of model_evaluation.ipynb (ImageNet weights, Adam 1e-3, cross-entropy)
+
+    python3 codes/train_small_model.py --arch mobilenet_v2 --epochs 10
+
+(1) small_model:
+    - A torchvision backbone pretrained on ImageNet, with a new classification layer
+(2) train:
+    - Train the model for one epoch
+
+'''
+
+## Necessary Packages
+import argparse
+import time
+import torch
+import torchvision.models as models
+from torch import nn
+from torch import optim
+from clothes_recognition import CLASSES
+from evaluation import (load_dataset, evaluate)
+
+def small_model(arch, num_classes):
+
+    '''
+
+    Args:
+        - arch: (str) 'mobilenet_v2' or 'resnet18'
+        - num_classes: (int) number of outfit classes
+    Returns:
+        - (torch.nn.Module) the model, with ImageNet weights
+
+    '''
+
+    constructor = getattr(models, arch)
+    try:
+        model = constructor(weights='DEFAULT')
+    except TypeError:
+        # torchvision < 0.13
+        model = constructor(pretrained=True)
+
+    if arch == 'mobilenet_v2':
+        model.classifier[1] = nn.Linear(in_features = model.last_channel, out_features = num_classes)
+    else:
+        model.fc = nn.Linear(in_features = model.fc.in_features, out_features = num_classes)
+    return model
+
+def train(dataloader, model, optimizer, criterion, device):
+
+    '''
+
+    Args:
+        - dataloader: (torch.utils.data.DataLoader) training dataset
+        - model: (torch.nn.Module) the model
+        - optimizer: (torch.optim) optimizer
+        - criterion: (torch.nn) loss function
+        - device: (torch.device) either cpu or gpu (cuda)
+    Returns:
+        - train_loss: (float) training loss
+        - train_acc: (float) training accuracy
+
+    '''
+
+    model.train()
+    running_loss, running_corrects = 0, 0
+    for inputs, labels in dataloader:
+        X = inputs.to(device)
+        labels = labels.long().to(device)
+
+        optimizer.zero_grad()
+
+        outputs = model(X)
+        _, preds = outputs.data.max(1)
+
+        loss = criterion(outputs, labels)
+        loss.backward()
+
+        optimizer.step()
+
+        running_loss += loss.item() * inputs.size(0)
+        running_corrects += torch.sum(preds == labels.data).item()
+
+    return (running_loss / len(dataloader.dataset), running_corrects / len(dataloader.dataset))
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the small model of the outfit classification cascade')
+    parser.add_argument('--arch', choices=['mobilenet_v2', 'resnet18'], default='mobilenet_v2')
+    parser.add_argument('--train', default='dataset/train')
+    parser.add_argument('--test', default='dataset/test')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', default='models/clothe_model_small.pkl')
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if (torch.cuda.is_available()) else "cpu")
+    train_loader = load_dataset(args.train, args.batch_size, shuffle=True)
+    test_loader = load_dataset(args.test, args.batch_size)
+
+    model = small_model(args.arch, len(CLASSES)).to(device)
+    optimizer = optim.Adam(model.parameters(), 1e-3)
+    criterion = nn.CrossEntropyLoss()
+
+    for epoch in range(args.epochs):
+        since = time.time()
+        train_loss, train_acc = train(train_loader, model, optimizer, criterion, device)
+        epoch_time = (time.time() - since) / 60
+        print(f'{epoch}\t Epoch Time: {epoch_time:.2f}mins\t Loss: {train_loss:.2f}\t Acc: {train_acc:.2f}')
+
+    model.eval()
+    test_acc, _ = evaluate(model, test_loader, device)
+    print(f'Test Acc: {test_acc * 100:.2f}%')
+
+    # Saved like models/clothe_model.pkl (the whole model), loaded on J-Bot by inference.load_model
+    torch.save(model.cpu(), args.output)
+    print(f'Saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+tts_cache.py
+
+(1) speech_key:
+    - Build the content address of a synthesized sentence from the voice, language and text
+(2) TTSCache:
+    - On-disk store of the synthesized speech, with an in-memory index and LRU eviction
+      under a size limit
+
+'''
+
+## Necessary Packages
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import config
+
+
+def speech_key(voice_name, language_code, text):
+
+    '''
+
+    Build the content address of a synthesized sentence
+
+    Args:
+        voice_name: (str) name of the Google Cloud voice, e.g. 'en-US-Wavenet-F'
+        language_code: (str) language of the voice, e.g. 'en-US'
+        text: (str) the text that is converted to speech
+
+    Returns:
+        (str) hexadecimal SHA-256 of the voice, language and text
+
+    '''
+
+    content = json.dumps([voice_name, language_code, text], ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+
+    '''
+
+    Store of the synthesized speech, one '<key>.wav' file per sentence.
+    The in-memory index keeps the files in least-recently-used order (rebuilt from the
+    modification times at start-up), and the oldest files are removed once the store is
+    bigger than `max_bytes`
+
+    Args:
+        cache_dir: (str) directory storing the wav files
+        max_bytes: (int) maximum size of the store
+
+    '''
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.wav')
+
+    def get(self, key):
+
+        '''
+
+        Look up a synthesized sentence
+
+        Args:
+            key: (str) content address from speech_key
+
+        Returns:
+            (str) path of the wav file, None if the sentence was never synthesized
+
+        '''
+
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._index.move_to_end(key)
+            path = self.path(key)
+
+        # Keep the LRU order across restarts
+        try:
+            os.utime(path)
+        except OSError:
+            # Removed behind our back, forget it
+            with self._lock:
+                self._forget(key)
+            return None
+        return path
+
+    def read(self, key):
+
+        '''
+
+        Look up a synthesized sentence and read its audio
+
+        Args:
+            key: (str) content address from speech_key
+
+        Returns:
+            (bytes) the wav audio, None if the sentence was never synthesized
+
+        '''
+
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, audio_content):
+
+        '''
+
+        Store a synthesized sentence, evicting the least recently used ones if needed
+
+        Args:
+            key: (str) content address from speech_key
+            audio_content: (bytes) the wav audio
+
+        Returns:
+            (str) path of the wav file
+
+        '''
+
+        path = self.path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(audio_content)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(audio_content)
+            self._size += len(audio_content)
+            self._evict()
+        return path
+
+    def stats(self):
+
+        '''
+
+        Returns:
+            (dict) hits, misses, evictions, number of entries and size in bytes of the store
+
+        '''
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._index), 'bytes': self._size}
+
+    def _load_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                # Left over by an interrupted write
+                os.remove(path)
+                continue
+            if not name.endswith('.wav'):
+                continue
+            st = os.stat(path)
+            entries.append((st.st_mtime, name[:-len('.wav')], st.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    def _forget(self, key):
+        # Called with the lock held
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self):
+        # Called with the lock held. The newest entry is always kept, even if it alone is too big
+        while self._size > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+
+tts_cache = TTSCache(config.TTS_CACHE_DIR, config.TTS_CACHE_MAX_BYTES)
@@ -14,7 +14,8 @@ Authors:
 weather_callAPI.py
 
 (1) collect_data: 
-    - Collect the weather information and air quality from the API's
+    - Collect the weather information and air quality from the API's (concurrently, on a
+      shared keep-alive session)
 (2) filter_weather_data: 
     - Extract temperature and weather condition (current and forecasted) from the weather data 
       extracted from the OpenWeather API
@@ -26,17 +27,233 @@ weather_callAPI.py
     - Standarize the weather condition for J-Bot to communicate user-friendly
 (6) get_outside_condition:
     - Get the data from the OpenWeather API and process them accordingly
+(7) fetch_json:
+    - Get the JSON response of an API using the shared keep-alive session
+(8) get_location:
+    - Get the current geolocation of J-Bot (static override, cached on disk or IP lookup)
+(9) fetch_weather / fetch_air:
+    - Get the filtered weather / air quality information, used concurrently by collect_data
+(10) locate_by_ip:
+    - Get the IP geolocation of J-Bot
+
+Every API call goes through the policy of its service (timeouts, retries, circuit breaker,
+last good response, see call_policy.py)
 
 '''
 
 ## Necessary Packages
+import config
+import functools
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import geocoder
+import json
+import os
+import socket
+import time
 from datetime import datetime
-import copy
+from concurrent.futures import ThreadPoolExecutor
+from call_policy import get_policy
+from tracing import traced
+
+# The weather and the air quality of every concurrent command (e.g. the config.SERVICE_WORKERS
+# requests of service.py, each for its own location) are fetched at the same time
+fetch_workers = max(config.FETCH_WORKERS, 2 * config.SERVICE_WORKERS)
+pool_size = max(config.HTTP_POOL_SIZE, 2 * config.SERVICE_WORKERS)
+
+# A single keep-alive session shared by every request, so the TCP/TLS connections to the APIs
+# are reused instead of being opened for each call
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+
+# Workers running the API calls at the same time
+fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='weather-fetch')
+
+def fetch_json(url, timeout=None):
+
+    '''
+
+    Get the JSON response of an API using the shared session
+
+    Args:
+        - url: (string) url of the API request
+        - timeout: (float) seconds to wait for the API (see call_policy.py)
+    Returns:
+        - (dict) the decoded response
+
+    '''
+
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def network_fingerprint():
+
+    '''
+
+    Describe the network J-Bot is connected to, so the cached geolocation is dropped when the
+    network interface changes. No packet is sent: connecting a UDP socket only selects the
+    local address of the default route
+
+    Returns:
+        - (string) the network interfaces and the local address of the default route
+
+    '''
+
+    interfaces = ','.join(sorted(name for _, name in socket.if_nameindex()))
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('8.8.8.8', 80))
+            address = s.getsockname()[0]
+    except OSError:
+        address = ''
+    return f'{interfaces}|{address}'
 
-def collect_data(api_key_weather, api_key_air):
+def read_location_cache(network):
+
+    '''
+
+    Read the geolocation stored on disk
+
+    Args:
+        - network: (string) the current network fingerprint
+    Returns:
+        - (lat, lon) if the stored geolocation is still valid, None otherwise
+
+    '''
+
+    try:
+        with open(config.LOCATION_CACHE_FILE) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('network') != network:
+        return None
+    if time.time() - cached.get('time', 0) > config.LOCATION_CACHE_TTL:
+        return None
+    return cached['lat'], cached['lon']
+
+def write_location_cache(lat, lon, network):
+
+    '''
+
+    Store the geolocation on disk (written to a temporary file first, so a crash never
+    leaves a truncated cache)
+
+    Args:
+        - lat: (string) latitude
+        - lon: (string) longitude
+        - network: (string) the current network fingerprint
+
+    '''
+
+    cache_dir = os.path.dirname(config.LOCATION_CACHE_FILE)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = config.LOCATION_CACHE_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'lat': lat, 'lon': lon, 'network': network, 'time': time.time()}, f)
+    os.replace(tmp_path, config.LOCATION_CACHE_FILE)
+
+def locate_by_ip(timeout=None):
+
+    '''
+
+    Args:
+        - timeout: (float) seconds to wait for the geolocation service (see call_policy.py)
+    Returns:
+        - (list) [lat, lon] of the public IP address of J-Bot
+
+    '''
+
+    g = geocoder.ip('me', session=session, timeout=timeout)
+    if not g.ok:
+        raise ConnectionError(f'IP geolocation failed: {g.status}')
+    return g.latlng
+
+@traced()
+def get_location():
+
+    '''
+
+    Get your current geolocation in latitude and longitude
+        1. The static location from config.LOCATION_OVERRIDE, if any
+        2. The location stored on disk, unless it expired or the network interface changed
+        3. The IP geolocation, which is then stored on disk
+
+    Returns:
+        - lat: (string) latitude
+        - lon: (string) longitude
+
+    '''
+
+    if config.LOCATION_OVERRIDE is not None:
+        lat, lon = config.LOCATION_OVERRIDE
+        return str(lat), str(lon)
+
+    network = network_fingerprint()
+    cached = read_location_cache(network)
+    if cached is not None:
+        return cached
+
+    latlng = get_policy('geolocation').call(locate_by_ip)
+    lat = str(latlng[0])
+    lon = str(latlng[1])
+    try:
+        write_location_cache(lat, lon, network)
+    except OSError as e:
+        print(f'Could not store the geolocation: {e}')
+    return lat, lon
+
+@traced()
+def fetch_weather(api_key_weather, location=None):
+
+    '''
+
+    Locate J-Bot and get the weather forecast for that location from the OpenWeather API
+
+    Args:
+        - api_key_weather: (string) your key for the OpenWeather API
+        - location: (lat, lon) of another robot, None to locate J-Bot
+    Returns:
+        - (dict) the filtered weather information
+
+    '''
+
+    lat, lon = location if location is not None else get_location()
+    weather_url = config.OPENWEATHER_URL + "/data/2.5/onecall?lat=%s&lon=%s&appid=%s&units=metric" % (lat, lon, api_key_weather)
+    weather_d = get_policy('openweather').call(functools.partial(fetch_json, weather_url), key=(lat, lon))
+    return filter_weather_data(weather_d)
+
+@traced()
+def fetch_air(api_key_air, location=None):
+
+    '''
+
+    Get the air quality of the nearest city from the AirVisual API. J-Bot is located by
+    AirVisual from its IP (so it does not need to wait for the geolocation), unless a static
+    location is set in config.LOCATION_OVERRIDE: the weather and the air quality are then
+    for the same place
+
+    Args:
+        - api_key_air: (string) your key for the AirVisual API
+        - location: (lat, lon) of another robot, None for the city of J-Bot
+    Returns:
+        - (dict) the filtered air quality information
+
+    '''
+
+    if location is None and config.LOCATION_OVERRIDE is not None:
+        location = get_location()
+    air_url = f"{config.AIRVISUAL_URL}/v2/nearest_city?key={api_key_air}"
+    if location is not None:
+        air_url += "&lat=%s&lon=%s" % location
+    air_d = get_policy('airvisual').call(functools.partial(fetch_json, air_url), key=location)
+    return filter_air_data(air_d)
+
+def collect_data(api_key_weather, api_key_air, location=None):
 
     '''
 
@@ -50,39 +267,27 @@ def collect_data(api_key_weather, api_key_air):
 
     -----------------------------
 
-    This function returns the weather and air quality information from the APIs
+    This function returns the weather and air quality information from the APIs.
+    The weather (with the geolocation it depends on) and the air quality are requested at
+    the same time, so the total latency is the slowest of both instead of their sum
 
     Args:
         - api_key_weather: (string) your key for the OpenWeather API
         - api_key_air: (string) your key for the AirVisual API
+        - location: (lat, lon) of another robot, None for J-Bot
     Returns:
         - collected_data: (dict) the information related to the weather and the air quality
 
     '''
-    
-    # Getting your current geolocation in latitude and longitude
-    g = geocoder.ip('me')
-    lat = str(g.latlng[0])
-    lon = str(g.latlng[1])
 
-    collected_data = {}
+    weather_future = fetch_pool.submit(fetch_weather, api_key_weather, location)
+    air_future = fetch_pool.submit(fetch_air, api_key_air, location)
+
+    # Getting all the information from the OpenWeather API and AirVisual API.
+    # The filtered weather dict is built for this request only, so it is extended in place
+    collected_data = weather_future.result()
+    collected_data['air_condition'] = air_future.result()
 
-    # The Weather and AirQuality API urls
-    weather_url = "https://api.openweathermap.org/data/2.5/onecall?lat=%s&lon=%s&appid=%s&units=metric" % (lat, lon, api_key_weather)
-    air_url = f"http://api.airvisual.com/v2/nearest_city?key={api_key_air}"
-    
-    weather_response = requests.get(weather_url)
-    weather_data = json.loads(weather_response.text)
-    weather_data_filtered = filter_weather_data(weather_data)
-    
-    air_response = requests.get(air_url)
-    iqair_data = json.loads(air_response.text)
-    iqair_data_filtered = filter_air_data(iqair_data)
-    
-    # Getting all the information from the OpenWeather API and AirVisual API
-    collected_data = copy.deepcopy(weather_data_filtered)
-    collected_data['air_condition'] = iqair_data_filtered
-    
     return collected_data
 
 def filter_weather_data(weather_d):
@@ -255,7 +460,8 @@ def convert_weather_condition_data(d):
         
     return d
 
-def get_outside_condition():
+@traced()
+def get_outside_condition(location=None):
 
     '''
 
@@ -271,6 +477,8 @@ def get_outside_condition():
 
     Getting the data from the OpenWeather API and processing them accordingly
 
+    Args:
+        - location: (lat, lon) of another robot (e.g. a client of service.py), None for J-Bot
     Returns:
         - d: (dict) Processed weather information
 
@@ -279,7 +487,7 @@ def get_outside_condition():
     api_key_ow = '' # <Your subscription key> 
     api_key_iq = '' # <Your subscription key>
 
-    d = collect_data(api_key_ow, api_key_iq)
+    d = collect_data(api_key_ow, api_key_iq, location)
     d = convert_time_data(d)
     d = convert_weather_condition_data(d)
 
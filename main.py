@@ -12,56 +12,141 @@ Authors:
 
 main.py
 
+(1) handle_command:
+    - Respond to one command of the user
+(2) report:
+    - Print the stage latencies and the cache counters
+(3) main:
+    - Listen to the user and respond to the commands, forever
+
 '''
 
 ## Necessary Packages
-from codes.jetbot_actions import (speech_to_text, trigger_speech, text_to_wav, play)
-import traitlets
-import ipywidgets.widgets as widgets
-from jetbot import Camera, bgr8_to_jpeg
+import os
+import sys
 
-'''
-Initiating the J-Bot camera for the first time is a slow process, hence we initiate the camera
-once the J-Bot is turn on
-'''
-camera = Camera.instance(width=224, height=224)
-image = widgets.Image(format='jpeg', width=224, height=224)
-camera_link = traitlets.dlink((camera, 'value'), (image, 'value'), transform=bgr8_to_jpeg)
-camera.stop()
-
-count = 0
-session = True
-while session:
-    # Waiting for the user to speak to J-Bot
-    keyword = speech_to_text()
-
-
-    # J-Bot wakes up if the user greet her
-    if (count == 0) and (keyword == 'hello robot'): 
-        count = 1
-        response_sentence = trigger_speech('greeting')
-        play(text_to_wav('en-US-Wavenet-F', response_sentence))
-
-    # If the user ask J-Bot for the weather, she responds accordingly
-    if (count > 0) and (keyword == 'weather'):
-        response_sentence = trigger_speech('weather')
-        play(text_to_wav('en-US-Wavenet-F', response_sentence))
-
-    # If the user ask J-Bot for the air quality, she responds accordingly
-    elif (count > 0) and (keyword == 'air pollution'): 
-        response_sentence = trigger_speech('air pollution')
-        play(text_to_wav('en-US-Wavenet-F', response_sentence))
+# The modules in codes/ import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'codes'))
+
+import startup
+import config
+from jetbot_actions import (speech_to_text, trigger_speech, get_clothe_model, get_tts_client, warm_up_camera,
+                            warm_up_microphone, warm_up_person_detector)
+from speaker import speak
+from call_policy import ServiceUnavailable
+from conditions_cache import cache_stats
+import tracing
+startup.mark('imports done')
+
+def handle_command(keyword, count):
+
+    '''
+
+    Respond to one command of the user
+
+    Args:
+        - keyword: (str) what the user said, None if it was not understood
+        - count: (int) 0 while J-Bot sleeps, 1 once the user greeted her
+    Returns:
+        - (int) the count after the command
+
+    '''
+
+    try:
+        # Every command is a span of the trace, containing the spans of its stages (see tracing.py)
+        with tracing.span('command', keyword=keyword):
+            # J-Bot wakes up if the user greet her
+            if (count == 0) and (keyword == 'hello robot'): 
+                count = 1
+                response_sentence = trigger_speech('greeting')
+                speak('en-US-Wavenet-F', response_sentence)
+
+            # If the user ask J-Bot for the weather, she responds accordingly
+            if (count > 0) and (keyword == 'weather'):
+                response_sentence = trigger_speech('weather')
+                speak('en-US-Wavenet-F', response_sentence)
+
+            # If the user ask J-Bot for the air quality, she responds accordingly
+            elif (count > 0) and (keyword == 'air pollution'): 
+                response_sentence = trigger_speech('air pollution')
+                speak('en-US-Wavenet-F', response_sentence)
+
+            # The user stands in front J-Bot and asks her how he/she look.
+            # J-Bot answers according the weather and the air quality
+            #     e.g. If it is cold and the user just wear a shirt, then J-Bot suggests a jacket
+            elif (count > 0) and (keyword == 'how do I look'):
+                response_sentence = trigger_speech('camera')
+                speak('en-US-Wavenet-F', response_sentence)
+
+            # J-Bot "sleeps" if the use says bye-bye
+            elif (count > 0) and (keyword == 'bye-bye robot'):
+                speak('en-US-Wavenet-F', "Okay see you later... ")
+                count = 0
+
+    # A remote service (weather, air quality, Azure, Google) is down and nothing can replace it:
+    # J-Bot keeps listening instead of waiting for it (see call_policy.py)
+    except ServiceUnavailable as e:
+        print(f'Could not answer {keyword!r}: {e}')
+
+    # No frame from the camera: J-Bot tells the user instead of stopping
+    except TimeoutError as e:
+        print(f'Could not answer {keyword!r}: {e}')
+        try:
+            speak('en-US-Wavenet-F', "Sorry, I cannot see you right now. Please ask me again.")
+        except ServiceUnavailable as e:
+            print(f'Could not answer {keyword!r}: {e}')
+
+    return count
+
+def report():
 
     '''
-    The user stands in front J-Bot and asks her how he/she look.
-    J-Bot answers according the weather and the air quality
-        e.g. If it is cold and the user just wear a shirt, then J-Bot suggests a jacket
+
+    Print the latency of every stage, and the counters of the conditions cache and of the
+    outfit cascade (every config.TRACE_REPORT_EVERY commands)
+
+    '''
+
+    tracing.report()
+    print(f'Conditions cache: {cache_stats()}')
+    # Only a loaded model is reported, nothing is loaded (or imported) here
+    inference = sys.modules.get('inference')
+    clothe_model = getattr(inference, 'session', None)
+    # Only the cascade of inference.CascadeSession has counters
+    if hasattr(clothe_model, 'stats'):
+        print('Cascade:', clothe_model.stats())
+
+def main():
+
     '''
-    elif (count > 0) and (keyword == 'how do I look'):
-        response_sentence = trigger_speech('camera')
-        play(text_to_wav('en-US-Wavenet-F', response_sentence))
-
-    # J-Bot "sleeps" if the use says bye-bye
-    elif (count > 0) and (keyword == 'bye-bye robot'):
-        play(text_to_wav('en-US-Wavenet-F', "Okay see you later... "))
-        count = 0
+
+    Listen to the user and respond to the commands, until the program is stopped
+
+    '''
+
+    # Loading the outfit model and initiating the J-Bot camera for the first time are slow processes,
+    # hence they are done while J-Bot already listens (or before listening if config.BACKGROUND_WARM_UP is False).
+    # The start-up report is printed once they are ready
+    startup.warm_up([('microphone', warm_up_microphone),
+                     ('clothe model', get_clothe_model),
+                     ('person detector', warm_up_person_detector),
+                     ('camera', warm_up_camera),
+                     ('text-to-speech client', get_tts_client)],
+                    background=config.BACKGROUND_WARM_UP)
+    startup.mark('listening')
+
+    count = 0
+    commands = 0
+    session = True
+    while session:
+        # Waiting for the user to speak to J-Bot (the phrases are recognized in the background)
+        keyword = speech_to_text()
+        count = handle_command(keyword, count)
+
+        commands += 1
+        if config.TRACE_REPORT_EVERY and commands % config.TRACE_REPORT_EVERY == 0:
+            report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# coding: utf-8
+'''
+Final Project for KSE624 Mobile and Pervasive Computing for Knowledge Services Spring 2020 at KAIST
+
+Last Updated Date: July 01 2020
+Authors:
+    Rafikatiwi Nur Pujiarti
+    Willmer R. Quinones
+
+-----------------------------
+
+service.py
+
+Headless J-Bot: the commands of main.py as HTTP endpoints, so several robots (or any HTTP
+client) share one conditions cache, one outfit model and one text-to-speech client
+
+    python3 service.py [--host 0.0.0.0] [--port 8080]
+
+    GET  /greeting          "hello robot"
+    GET  /weather           "weather"
+    GET  /air-pollution     "air pollution"
+    GET  /camera            "how do I look", with the camera of this J-Bot
+    POST /camera            "how do I look", with the uploaded image(s) of the user, either as
+                            the request body or as the 'image' fields of a multipart form
+    GET  /stats             conditions cache, micro-batching, remote service and stage latency numbers
+
+The replies are json {"intent": ..., "text": ..., "seconds": ...}, or the spoken reply (wav)
+with ?audio=1. A robot far from this machine gives its location with ?lat=...&lon=...
+Each uploaded image is limited to config.SERVICE_MAX_IMAGE bytes, and all of them together
+to config.SERVICE_MAX_UPLOAD bytes (413 otherwise). The requests are served by an asyncio
+server, and the blocking work (APIs, model, text-to-speech) runs on a pool of
+config.SERVICE_WORKERS threads.
+
+'''
+
+## Necessary Packages
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+
+# The modules in codes/ import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'codes'))
+
+import startup
+import config
+import batching
+import tracing
+from batching import get_batcher
+from call_policy import (ServiceUnavailable, policy_stats)
+from conditions_cache import (get_cached_condition, cache_stats)
+from jetbot_actions import (trigger_speech, text_to_audio, get_tts_client, camera_frames)
+from person_detectors import get_detector
+from preprocessing import Frame
+
+# Endpoint -> command of trigger_speech
+INTENTS = {'greeting': 'greeting',
+           'weather': 'weather',
+           'air-pollution': 'air pollution',
+           'camera': 'camera'}
+
+workers = ThreadPoolExecutor(config.SERVICE_WORKERS, thread_name_prefix='command-worker')
+
+
+class CameraUnavailable(Exception):
+
+    '''
+
+    This machine has no camera (no jetbot package), or its camera gave no frame
+
+    '''
+
+
+async def run_blocking(function, *args):
+
+    '''
+
+    Args:
+        - function: blocking function, run on the worker pool
+        - args: its arguments
+    Returns:
+        - the result of the function, without blocking the server meanwhile
+
+    '''
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(workers, functools.partial(function, *args))
+
+async def read_images(request):
+
+    '''
+
+    Args:
+        - request: (aiohttp.web.Request) POST /camera request
+    Returns:
+        - (list) the uploaded images, as encoded bytes
+
+    '''
+
+    if request.content_type.startswith('multipart/'):
+        images = []
+        total = 0
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name != 'image':
+                continue
+            # Read chunk by chunk, so an oversized image is refused before it is in memory
+            data = bytearray()
+            while True:
+                chunk = await part.read_chunk()
+                if not chunk:
+                    break
+                data += chunk
+                check_size(len(data), config.SERVICE_MAX_IMAGE)
+                check_size(total + len(data), config.SERVICE_MAX_UPLOAD)
+            total += len(data)
+            images.append(bytes(data))
+        return images
+    # The body is already limited to config.SERVICE_MAX_UPLOAD by the application
+    body = await request.read()
+    check_size(len(body), config.SERVICE_MAX_IMAGE)
+    return [body] if body else []
+
+def check_size(size, max_size):
+    if size > max_size:
+        raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=size)
+
+def decode_images(images):
+    return [Frame.from_bytes(data) for data in images]
+
+def answer(trigger_type, images=None, location=None):
+    # The outfits of every robot are classified by the shared micro-batcher (see batching.py)
+    clothe_model = get_batcher() if trigger_type == 'camera' else None
+    if trigger_type == 'camera' and images is None:
+        try:
+            images = camera_frames()
+        except (TimeoutError, ImportError) as e:
+            # No camera on this machine, or no frame from it
+            raise CameraUnavailable(str(e)) from e
+    with tracing.span('command', keyword=trigger_type):
+        return trigger_speech(trigger_type, images, clothe_model, location)
+
+def request_location(request):
+
+    '''
+
+    Args:
+        - request: (aiohttp.web.Request) the request
+    Returns:
+        - (lat, lon) from the ?lat=...&lon=... query, None for the location of this machine
+
+    '''
+
+    if 'lat' not in request.query and 'lon' not in request.query:
+        return None
+    try:
+        lat, lon = float(request.query['lat']), float(request.query['lon'])
+    except (KeyError, ValueError):
+        raise web.HTTPBadRequest(text='The location needs both a numeric lat and lon')
+    # An invalid location is refused here, before the weather services are asked for it
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise web.HTTPBadRequest(text='The location needs -90 <= lat <= 90 and -180 <= lon <= 180')
+    return (lat, lon)
+
+async def respond(request, trigger_type, images=None):
+
+    '''
+
+    Args:
+        - request: (aiohttp.web.Request) the request
+        - trigger_type: (str) command of trigger_speech
+        - images: (list) preprocessing.Frame images of the user, for the camera command
+    Returns:
+        - (aiohttp.web.Response) the reply as json, or as wav audio with ?audio=1
+
+    '''
+
+    since = time.perf_counter()
+    location = request_location(request)
+    try:
+        text = await run_blocking(answer, trigger_type, images, location)
+    except CameraUnavailable as e:
+        raise web.HTTPServiceUnavailable(text=f'Camera unavailable: {e}')
+    except ServiceUnavailable as e:
+        # A remote service is down and has no recent response to fall back to
+        raise web.HTTPServiceUnavailable(text=str(e))
+
+    if request.query.get('audio') in ('1', 'true'):
+        try:
+            audio = await run_blocking(text_to_audio, config.SERVICE_VOICE, text)
+        except ServiceUnavailable as e:
+            raise web.HTTPServiceUnavailable(text=str(e))
+        return web.Response(body=audio, content_type='audio/wav')
+
+    return web.json_response({'intent': trigger_type,
+                              'text': text,
+                              'seconds': round(time.perf_counter() - since, 3)})
+
+async def intent(request):
+    name = request.match_info['intent']
+    if name not in INTENTS:
+        raise web.HTTPNotFound(text=f'Unknown intent {name!r}, expected one of {sorted(INTENTS)}')
+    return await respond(request, INTENTS[name])
+
+async def upload(request):
+    images = await read_images(request)
+    if not images:
+        raise web.HTTPBadRequest(text='No image uploaded')
+    try:
+        frames = await run_blocking(decode_images, images)
+    except OSError as e:
+        raise web.HTTPBadRequest(text=f'Unreadable image: {e}')
+    if len({frame.array.shape for frame in frames}) > 1:
+        raise web.HTTPBadRequest(text='The uploaded images must have the same size')
+    return await respond(request, 'camera', frames)
+
+async def stats(request):
+    # Only the loaded subsystems are reported, nothing is loaded here
+    batcher = batching.batcher
+    return web.json_response({'conditions_cache': cache_stats(),
+                              'classification': batcher.stats() if batcher else None,
+                              'remote_services': policy_stats(),
+                              'stages': tracing.stage_stats()})
+
+def create_app():
+
+    '''
+
+    Returns:
+        - (aiohttp.web.Application) the command service
+
+    '''
+
+    app = web.Application(client_max_size=config.SERVICE_MAX_UPLOAD)
+    app.router.add_get('/stats', stats)
+    app.router.add_post('/camera', upload)
+    app.router.add_get('/{intent}', intent)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the J-Bot commands over HTTP')
+    parser.add_argument('--host', default=config.SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVICE_PORT)
+    args = parser.parse_args()
+
+    # Everything shared by the robots is ready before the first request
+    startup.warm_up([('clothe model', get_batcher),
+                     ('person detector', get_detector),
+                     ('conditions', get_cached_condition),
+                     ('text-to-speech client', get_tts_client)],
+                    background=False)
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()